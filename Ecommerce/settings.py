@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
@@ -83,6 +84,29 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # Take the write lock when a transaction starts, so concurrent writers
+            # wait for each other instead of failing with "database is locked"
+            "transaction_mode": "IMMEDIATE",
+        },
+        "TEST": {
+            # A file rather than shared memory, so threaded tests lock like the server
+            "NAME": Path(tempfile.gettempdir()) / "ecommerce_test_db.sqlite3",
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Holds the catalog and coupon version stamps. LocMemCache is per process, which
+# is only right for a single worker (e.g. runserver). With several worker
+# processes, point this at a shared backend (Redis/Memcached) so every worker
+# sees version bumps; `manage.py check --deploy` warns about it (products.W001).
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     }
 }
 
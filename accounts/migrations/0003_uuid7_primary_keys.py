@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:38
+
+import base.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_profile_address_line_1_profile_address_line_2_and_more"),
+    ]
+
+    # The key default is generated in Python, so the schema is unchanged; only
+    # the migration state changes and no table has to be rebuilt.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="profile",
+                    name="uid",
+                    field=models.UUIDField(
+                        default=base.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+            ],
+        ),
+    ]
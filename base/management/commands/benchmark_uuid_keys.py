@@ -0,0 +1,83 @@
+"""
+Management command to compare random (v4) and time-ordered (v7) UUID primary keys
+Run: python manage.py benchmark_uuid_keys --rows 1000000
+
+Inserts the same number of rows into a scratch SQLite table shaped like
+`cart_cartitems` (a char(32) uuid primary key plus an indexed foreign key) once
+per key generator, and reports insert throughput and the size of the primary
+key index. The project database is not touched.
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from base.models import uuid7
+
+GENERATORS = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks insert throughput and index size of uuid4 vs uuid7 primary keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--cache-mb', type=int, default=8,
+                            help='SQLite page cache; keep it well below the index size to mimic a large table')
+
+    def handle(self, *args, **options):
+        carts = [uuid.uuid4().hex for _ in range(1000)]
+        self.stdout.write(f"{'keys':<8}{'insert rows/s':>15}{'last 10% rows/s':>18}{'pk index MB':>14}{'pages':>10}")
+        for name, generate in GENERATORS.items():
+            with tempfile.TemporaryDirectory() as directory:
+                result = self.run(os.path.join(directory, 'bench.sqlite3'), generate, carts, options)
+            self.stdout.write(
+                f"{name:<8}{result['rate']:>15.0f}{result['tail_rate']:>18.0f}"
+                f"{result['index_bytes'] / 1024 / 1024:>14.1f}{result['index_pages']:>10}"
+            )
+
+    def run(self, path, generate, carts, options):
+        rows = options['rows']
+        batch_size = options['batch_size']
+        db = sqlite3.connect(path)
+        db.execute(f"PRAGMA cache_size = -{options['cache_mb'] * 1024}")
+        db.execute(
+            'CREATE TABLE bench ("uid" char(32) NOT NULL PRIMARY KEY, "cart_id" char(32) NOT NULL, '
+            '"quantity" integer NOT NULL, "create_at" datetime NOT NULL)'
+        )
+        db.execute('CREATE INDEX bench_cart_id ON bench ("cart_id")')
+
+        elapsed = tail_elapsed = 0.0
+        tail_start = rows - rows // 10
+        for start in range(0, rows, batch_size):
+            count = min(batch_size, rows - start)
+            # Keys are generated outside the timed section; only the inserts are measured
+            batch = [
+                (generate().hex, carts[i % len(carts)], 1, '2024-01-01 00:00:00')
+                for i in range(start, start + count)
+            ]
+            started = time.perf_counter()
+            with db:
+                db.executemany('INSERT INTO bench VALUES (?, ?, ?, ?)', batch)
+            took = time.perf_counter() - started
+            elapsed += took
+            if start >= tail_start:
+                tail_elapsed += took
+
+        index_pages, index_bytes = db.execute(
+            "SELECT count(*), sum(pgsize) FROM dbstat WHERE name = 'sqlite_autoindex_bench_1'"
+        ).fetchone()
+        db.close()
+        return {
+            'rate': rows / elapsed,
+            'tail_rate': (rows - tail_start) / tail_elapsed if tail_elapsed else 0,
+            'index_bytes': index_bytes,
+            'index_pages': index_pages,
+        }
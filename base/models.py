@@ -1,11 +1,29 @@
 from django.db import models
+import os
+import time
 import uuid
 
 
+def uuid7(timestamp_ms=None, random_bits=None):
+    """Time-ordered UUID (RFC 9562 version 7): 48-bit Unix milliseconds, then 74 random bits.
+
+    Keys created close together sort close together, so inserts land at the
+    right-hand edge of primary key indexes instead of all over them.
+    """
+    if timestamp_ms is None:
+        timestamp_ms = time.time_ns() // 1_000_000
+    if random_bits is None:
+        random_bits = int.from_bytes(os.urandom(10), 'big')
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80 | random_bits & ((1 << 80) - 1)
+    value = value & ~(0xF << 76) | 0x7 << 76  # version
+    value = value & ~(0x3 << 62) | 0x2 << 62  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+
 class BaseModel(models.Model):
-    uid = models.UUIDField(primary_key=True, editable=False, default=uuid.uuid4)
+    uid = models.UUIDField(primary_key=True, editable=False, default=uuid7)
     create_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        abstract = True
\ No newline at end of file
+        abstract = True
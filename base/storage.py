@@ -0,0 +1,62 @@
+"""
+Content-addressed file storage.
+
+Uploads are stored once under the SHA-256 digest of their bytes, as
+`blobs/<aa>/<bb>/<digest>.<ext>`, so the same image uploaded for many
+products, colors or categories is one file with one long-cacheable URL.
+Files derived from a stored file, such as renditions, are written with
+`save_derived()` under the exact name given.
+
+Blobs may be shared between rows, so they are never deleted when a row goes
+away. Existing files are moved over with `python manage.py dedupe_images`.
+"""
+
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'blobs'
+
+
+def content_digest(content):
+    """SHA-256 hex digest of a Django File, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(digest, original_name):
+    _, ext = os.path.splitext(original_name)
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}'
+
+
+def is_blob_name(name):
+    return name.replace('\\', '/').startswith(f'{BLOB_DIR}/')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = blob_name(content_digest(content), name)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def save_derived(self, name, content, max_length=None):
+        """Store `content` under `name` itself rather than its digest."""
+        return super().save(name, content, max_length)
+
+
+_storage = ContentAddressedStorage()
+
+
+def content_addressed_storage():
+    """Storage callable for FileFields, so migrations reference it instead of its settings."""
+    return _storage
@@ -4,8 +4,8 @@ from .models import Cart, CartItems, Coupon, Payment
 
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
-    list_display = ['coupon_code', 'discount_price', 'minimum_amount', 'is_expired', 'create_at']
-    list_filter = ['is_expired', 'create_at']
+    list_display = ['coupon_code', 'discount_price', 'minimum_amount', 'valid_from', 'valid_until', 'is_expired', 'create_at']
+    list_filter = ['is_expired', 'valid_from', 'valid_until', 'create_at']
     search_fields = ['coupon_code']
     readonly_fields = ['uid', 'create_at', 'updated_at']
 
@@ -1,12 +1,12 @@
 from .views import get_cart
-from products.models import Category
+from products.catalog import get_catalog
 
 
 def cart_count(request):
     """Context processor to add cart count to all templates"""
     try:
         cart = get_cart(request)
-        cart_count = cart.cart_items.count()
+        cart_count = cart.item_count if cart else 0
     except:
         cart_count = 0
     
@@ -14,9 +14,9 @@ def cart_count(request):
 
 
 def categories(request):
-    """Context processor to add categories to all templates"""
+    """Context processor to add categories to all templates, from the in-process catalog snapshot"""
     try:
-        categories = Category.objects.all()[:10]
+        categories = get_catalog().categories[:10]
     except:
         categories = []
     
@@ -0,0 +1,106 @@
+"""
+Coupon engine: normalized codes and a process-local index of live coupons.
+
+Codes are stored upper-cased and stripped, so lookups are exact matches on
+the unique index. `get_coupon_book()` keeps the coupons that are currently
+live (not expired, inside their validity window) sorted by minimum amount,
+with the best few per prefix precomputed, so "applicable coupons for this
+total", "best coupon" and "spend more to unlock" are a bisect plus a slice
+however many promotions exist. The book is rebuilt when a coupon changes
+(a version stamp in the shared cache, like the catalog's) and when the
+next validity window opens or closes.
+"""
+
+from bisect import bisect_right
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from products.catalog import CatalogLocal
+
+COUPON_VERSION_KEY = 'coupons:version'
+# Coupons listed per section on the cart page
+COUPON_LIST_SIZE = 5
+
+
+def normalize_code(code):
+    return (code or '').strip().upper()
+
+
+def get_coupon_version():
+    version = cache.get(COUPON_VERSION_KEY)
+    if version is None:
+        cache.add(COUPON_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(COUPON_VERSION_KEY)
+    return version
+
+
+def bump_coupon_version():
+    transaction.on_commit(lambda: cache.set(COUPON_VERSION_KEY, time.time_ns(), timeout=None))
+
+
+def _rank(coupon):
+    """Better coupons sort first: bigger discount, then lower minimum."""
+    return (-coupon.discount_price, coupon.minimum_amount, coupon.coupon_code)
+
+
+class CouponBook:
+    """Live coupons sorted by minimum amount, with the best few of every prefix."""
+
+    def __init__(self, coupons, changes_at, size=COUPON_LIST_SIZE):
+        self.coupons = sorted(coupons, key=lambda coupon: (coupon.minimum_amount, _rank(coupon)))
+        self.minimums = [coupon.minimum_amount for coupon in self.coupons]
+        # best[i]: the `size` best coupons among coupons[:i + 1]
+        self.best = []
+        top = []
+        for coupon in self.coupons:
+            top = sorted(top + [coupon], key=_rank)[:size]
+            self.best.append(top)
+        # When the next coupon starts or ends; the book is stale from then on
+        self.changes_at = changes_at
+
+    def applicable(self, total):
+        """The best coupons a cart of `total` qualifies for, best first."""
+        index = bisect_right(self.minimums, total)
+        return self.best[index - 1] if index else []
+
+    def best_for(self, total):
+        coupons = self.applicable(total)
+        return coupons[0] if coupons else None
+
+    def locked(self, total, size=COUPON_LIST_SIZE):
+        """The coupons unlocked soonest by spending more than `total`."""
+        index = bisect_right(self.minimums, total)
+        return self.coupons[index:index + size]
+
+
+def _build_book():
+    from .models import Coupon
+
+    now = timezone.now()
+    pending = Coupon.objects.filter(is_expired=False).filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gt=now)
+    )
+    live, boundaries = [], []
+    for coupon in pending:
+        if coupon.valid_from and coupon.valid_from > now:
+            boundaries.append(coupon.valid_from)
+            continue
+        live.append(coupon)
+        if coupon.valid_until:
+            boundaries.append(coupon.valid_until)
+    return CouponBook(live, min(boundaries, default=None))
+
+
+_book = CatalogLocal(_build_book, version=get_coupon_version)
+
+
+def get_coupon_book():
+    book = _book.get()
+    if book.changes_at is not None and timezone.now() >= book.changes_at:
+        _book.clear()
+        book = _book.get()
+    return book
@@ -0,0 +1,40 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from base.exports import EXPORT_CHUNK_SIZE, export_response
+from .models import CartItems, Payment
+
+PAYMENT_EXPORT_COLUMNS = [
+    'uid', 'cart', 'username', 'razorpay_order_id', 'razorpay_payment_id', 'amount', 'status', 'create_at',
+]
+CART_ITEM_EXPORT_COLUMNS = [
+    'uid', 'cart', 'username', 'is_paid', 'product', 'size', 'color', 'quantity', 'create_at',
+]
+
+
+def _payment_rows():
+    payments = Payment.objects.values_list(
+        'uid', 'cart_id', 'cart__user__username', 'razorpay_order_id', 'razorpay_payment_id',
+        'amount', 'status', 'create_at',
+    ).order_by()
+    for row in payments.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield row[:-1] + (row[-1].isoformat(),)
+
+
+def _cart_item_rows():
+    items = CartItems.objects.values_list(
+        'uid', 'cart_id', 'cart__user__username', 'cart__is_paid', 'product__slug',
+        'size_variant__size', 'color_variant__color_name', 'quantity', 'create_at',
+    ).order_by()
+    for row in items.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield row[:-1] + (row[-1].isoformat(),)
+
+
+@staff_member_required
+def export_payments(request):
+    """Stream every payment as CSV or JSONL"""
+    return export_response(request, 'payments', PAYMENT_EXPORT_COLUMNS, _payment_rows())
+
+
+@staff_member_required
+def export_cart_items(request):
+    """Stream every cart item with its cart's owner and status as CSV or JSONL"""
+    return export_response(request, 'cart_items', CART_ITEM_EXPORT_COLUMNS, _cart_item_rows())
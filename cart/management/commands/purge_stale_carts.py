@@ -0,0 +1,55 @@
+"""
+Management command to delete abandoned anonymous carts
+Run: python manage.py purge_stale_carts
+
+Anonymous carts untouched for --days (empty ones after --empty-days) are
+deleted with their items in batches of --batch-size, each batch in its own
+short transaction, so the purge never holds a long write lock. Run it
+periodically (e.g. daily from cron).
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from cart.models import Cart, CartItems
+
+
+class Command(BaseCommand):
+    help = 'Deletes anonymous unpaid carts that have not been touched recently'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=30, help='Age of abandoned carts with items')
+        parser.add_argument('--empty-days', type=float, default=1, help='Age of abandoned empty carts')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        stale = Cart.objects.filter(user=None, is_paid=False, payment__isnull=True).filter(
+            Q(updated_at__lt=now - timedelta(days=options['days']))
+            | Q(item_count=0, updated_at__lt=now - timedelta(days=options['empty_days']))
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Would delete {stale.count()} stale carts'))
+            return
+
+        batch_size = options['batch_size']
+        started = time.monotonic()
+        carts = items = 0
+        while True:
+            with transaction.atomic():
+                pks = list(stale.order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+                items += CartItems.objects.filter(cart__in=pks).delete()[0]
+                carts += Cart.objects.filter(pk__in=pks).delete()[0]
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Deleted {carts} stale carts and {items} items in {elapsed:.1f}s'))
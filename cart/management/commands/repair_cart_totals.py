@@ -0,0 +1,43 @@
+"""
+Management command to reconcile the stored cart counters with the cart items
+Run: python manage.py repair_cart_totals
+
+Cart.item_count and Cart.subtotal are adjusted in place as items change.
+Writes that bypass the views and signals (raw SQL, bulk updates of catalog
+prices) can leave them stale; this recomputes them from the items. Only open
+carts are checked unless --all is given, since paid carts keep the amounts
+they were paid at in their Payment.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from cart.models import Cart
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Cart.item_count and Cart.subtotal from the cart items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Include paid carts')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        carts = Cart.objects.all() if options['all'] else Cart.objects.filter(is_paid=False)
+        batch_size = options['batch_size']
+        repaired = checked = 0
+        last = None
+        while True:
+            batch = carts.order_by('pk')
+            if last is not None:
+                batch = batch.filter(pk__gt=last)
+            pks = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            last = pks[-1]
+            checked += len(pks)
+            batch = Cart.objects.filter(pk__in=pks)
+            with transaction.atomic():
+                stored = set(batch.values_list('pk', 'item_count', 'subtotal'))
+                batch.recompute_totals()
+                repaired += len(stored - set(batch.values_list('pk', 'item_count', 'subtotal')))
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} carts, repaired {repaired}'))
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:38
+
+import base.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0003_payment"),
+    ]
+
+    # The key default is generated in Python, so the schema is unchanged; only
+    # the migration state changes and no table has to be rebuilt.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="cart",
+                    name="uid",
+                    field=models.UUIDField(
+                        default=base.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="cartitems",
+                    name="uid",
+                    field=models.UUIDField(
+                        default=base.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="coupon",
+                    name="uid",
+                    field=models.UUIDField(
+                        default=base.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="payment",
+                    name="uid",
+                    field=models.UUIDField(
+                        default=base.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+            ],
+        ),
+    ]
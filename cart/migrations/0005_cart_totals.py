@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:40
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Cart = apps.get_model("cart", "Cart")
+    CartItems = apps.get_model("cart", "CartItems")
+    line_price = (
+        F("product__price")
+        + Coalesce("size_variant__price", 0)
+        + Coalesce("color_variant__price", 0)
+    ) * F("quantity")
+    items = CartItems.objects.filter(cart=OuterRef("pk")).order_by().values("cart")
+    Cart.objects.update(
+        item_count=Coalesce(Subquery(items.annotate(n=Count("pk")).values("n")), 0),
+        subtotal=Coalesce(
+            Subquery(
+                items.filter(product__isnull=False)
+                .annotate(total=Sum(line_price))
+                .values("total")
+            ),
+            0,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0004_uuid7_primary_keys"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cart",
+            name="item_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="cart",
+            name="subtotal",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
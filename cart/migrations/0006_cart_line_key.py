@@ -0,0 +1,96 @@
+import uuid
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def line_key(*pks):
+    return ":".join(uuid.UUID(str(pk)).hex if pk else "" for pk in pks)
+
+
+def dedupe_carts(apps, schema_editor):
+    """Fill line_key and merge the rows the new unique constraints would reject."""
+    Cart = apps.get_model("cart", "Cart")
+    CartItems = apps.get_model("cart", "CartItems")
+    touched = set()
+
+    # One open cart per user: keep the most recently used one
+    users = (
+        Cart.objects.filter(is_paid=False, user__isnull=False)
+        .values("user")
+        .annotate(n=Count("pk"))
+        .filter(n__gt=1)
+        .values_list("user", flat=True)
+    )
+    for user_id in list(users):
+        carts = list(
+            Cart.objects.filter(user_id=user_id, is_paid=False)
+            .order_by("-updated_at", "-pk")
+            .values_list("pk", flat=True)
+        )
+        CartItems.objects.filter(cart__in=carts[1:]).update(cart=carts[0])
+        Cart.objects.filter(pk__in=carts[1:]).delete()
+        touched.add(carts[0])
+
+    batch = []
+    rows = CartItems.objects.order_by("pk").values_list(
+        "pk", "product_id", "size_variant_id", "color_variant_id"
+    )
+    for pk, product_id, size_id, color_id in rows.iterator(chunk_size=2000):
+        batch.append(CartItems(pk=pk, line_key=line_key(product_id, size_id, color_id)))
+        if len(batch) >= 2000:
+            CartItems.objects.bulk_update(batch, ["line_key"])
+            batch = []
+    CartItems.objects.bulk_update(batch, ["line_key"])
+
+    # One line per product/size/color in a cart: sum quantities into the oldest
+    duplicates = (
+        CartItems.objects.values("cart", "line_key")
+        .annotate(n=Count("pk"), total=Sum("quantity"))
+        .filter(n__gt=1)
+    )
+    for row in list(duplicates):
+        lines = list(
+            CartItems.objects.filter(cart=row["cart"], line_key=row["line_key"])
+            .order_by("create_at", "pk")
+            .values_list("pk", flat=True)
+        )
+        CartItems.objects.filter(pk=lines[0]).update(quantity=row["total"])
+        CartItems.objects.filter(pk__in=lines[1:]).delete()
+        touched.add(row["cart"])
+
+    line_price = (
+        F("product__price")
+        + Coalesce("size_variant__price", 0)
+        + Coalesce("color_variant__price", 0)
+    ) * F("quantity")
+    items = CartItems.objects.filter(cart=OuterRef("pk")).order_by().values("cart")
+    Cart.objects.filter(pk__in=touched).update(
+        item_count=Coalesce(Subquery(items.annotate(n=Count("pk")).values("n")), 0),
+        subtotal=Coalesce(
+            Subquery(
+                items.filter(product__isnull=False)
+                .annotate(total=Sum(line_price))
+                .values("total")
+            ),
+            0,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0005_cart_totals"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cartitems",
+            name="line_key",
+            field=models.CharField(default="", editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.RunPython(dedupe_carts, migrations.RunPython.noop),
+    ]
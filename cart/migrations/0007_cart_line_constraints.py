@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0006_cart_line_key"),
+        ("products", "0010_uuid7_primary_keys"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="cart",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_paid", False)),
+                fields=("user",),
+                name="one_open_cart_per_user",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="cartitems",
+            constraint=models.UniqueConstraint(
+                fields=("cart", "line_key"), name="unique_cart_line"
+            ),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:52
+
+from django.db import migrations, models
+
+
+def normalize_codes(apps, schema_editor):
+    """Upper-case and strip stored codes; ones that then collide get a numeric suffix."""
+    Coupon = apps.get_model("cart", "Coupon")
+    coupons = list(Coupon.objects.order_by("create_at", "pk"))
+    # Codes already in normal form keep them
+    taken = {
+        c.coupon_code for c in coupons if c.coupon_code == c.coupon_code.strip().upper()
+    }
+    for coupon in coupons:
+        if coupon.coupon_code in taken:
+            continue
+        code = base = coupon.coupon_code.strip().upper()
+        suffix = 2
+        while code in taken:
+            code = f"{base}-{suffix}"
+            suffix += 1
+        taken.add(code)
+        # New codes are normalized and old ones aren't, so renames never collide
+        Coupon.objects.filter(pk=coupon.pk).update(coupon_code=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0007_cart_line_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coupon",
+            name="valid_from",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="coupon",
+            name="valid_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="coupon",
+            index=models.Index(
+                fields=["valid_until", "valid_from", "minimum_amount"],
+                name="coupon_validity_idx",
+            ),
+        ),
+        migrations.RunPython(normalize_codes, migrations.RunPython.noop),
+    ]
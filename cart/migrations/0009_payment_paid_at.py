@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_paid_at(apps, schema_editor):
+    """Successful payments so far were last saved when they succeeded."""
+    Payment = apps.get_model("cart", "Payment")
+    Payment.objects.filter(status="Success").update(paid_at=F("updated_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0008_coupon_validity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="paid_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(fields=["paid_at", "uid"], name="payment_paid_idx"),
+        ),
+        migrations.RunPython(backfill_paid_at, migrations.RunPython.noop),
+    ]
@@ -1,49 +1,143 @@
-from django.db import models
-from base.models import BaseModel
+import logging
+import uuid
+
+from django.contrib.auth.signals import user_logged_in
+from django.db import connections, models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Sum
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from django.db.models.functions import Coalesce
+from base.models import BaseModel, uuid7
+from .coupons import bump_coupon_version, normalize_code
 from django.contrib.auth.models import User
 from products.models import Product, SizeVariant, ColorVariant
 
+logger = logging.getLogger(__name__)
+
 
 class Coupon(BaseModel):
+    # Stored normalized (see coupons.normalize_code) so lookups are exact
     coupon_code = models.CharField(max_length=50, unique=True)
     is_expired = models.BooleanField(default=False)
     discount_price = models.IntegerField(default=0)
     minimum_amount = models.IntegerField(default=0)
+    # Optional validity window; open-ended when empty
+    valid_from = models.DateTimeField(null=True, blank=True)
+    valid_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['valid_until', 'valid_from', 'minimum_amount'], name='coupon_validity_idx'),
+        ]
     
     def __str__(self) -> str:
         return f"{self.coupon_code} - ₹{self.discount_price} off"
+
+    def save(self, *args, **kwargs):
+        self.coupon_code = normalize_code(self.coupon_code)
+        super().save(*args, **kwargs)
+
+    def is_active(self, now=None):
+        """Not expired and inside its validity window"""
+        now = now or timezone.now()
+        if self.is_expired:
+            return False
+        if self.valid_from and now < self.valid_from:
+            return False
+        if self.valid_until and now >= self.valid_until:
+            return False
+        return True
     
     def is_valid(self, cart_total):
         """Check if coupon is valid for the given cart total"""
-        if self.is_expired:
+        if not self.is_active():
             return False
         if cart_total < self.minimum_amount:
             return False
         return True
 
 
+# Price of one cart line, for aggregates over CartItems
+LINE_PRICE = (
+    F('product__price') + Coalesce('size_variant__price', 0) + Coalesce('color_variant__price', 0)
+) * F('quantity')
+
+
+def line_key(product_id, size_variant_id, color_variant_id):
+    """Identity of a cart line: the product and variants it was added with."""
+    return ':'.join(uuid.UUID(str(pk)).hex if pk else '' for pk in (product_id, size_variant_id, color_variant_id))
+
+
+class CartQuerySet(models.QuerySet):
+
+    def recompute_totals(self, **fields):
+        """Reset item_count and subtotal of these carts from their items, in one UPDATE with `fields`."""
+        items = CartItems.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        return self.update(
+            **fields,
+            item_count=Coalesce(Subquery(items.annotate(n=Count('pk')).values('n')), 0),
+            subtotal=Coalesce(Subquery(
+                items.filter(product__isnull=False).annotate(total=Sum(LINE_PRICE)).values('total')
+            ), 0),
+        )
+
+
 class Cart(BaseModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="carts")
     is_paid = models.BooleanField(default=False)
     coupon = models.ForeignKey('Coupon', on_delete=models.SET_NULL, null=True, blank=True)
+    # Denormalized from cart_items; kept current by add_to_totals() and recompute_totals()
+    item_count = models.IntegerField(default=0)
+    subtotal = models.IntegerField(default=0)
+
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user'], condition=Q(is_paid=False), name='one_open_cart_per_user'),
+        ]
     
     def __str__(self) -> str:
         return f"{self.user.username if self.user else 'Anonymous'} - {self.uid}"
+
+    def add_to_totals(self, lines=0, amount=0):
+        """Atomically adjust the stored line count and subtotal, then reload them."""
+        Cart.objects.filter(pk=self.pk).update(
+            item_count=F('item_count') + lines,
+            subtotal=F('subtotal') + amount,
+            # Last activity, for purge_stale_carts
+            updated_at=timezone.now(),
+        )
+        self.refresh_from_db(fields=['item_count', 'subtotal', 'updated_at'])
     
+    def merge(self, other):
+        """Move the items of `other` into this cart and delete it, in a fixed number of queries.
+
+        Lines for the same product, size and color have their quantities summed;
+        the rest of `other`'s lines are moved over in one UPDATE.
+        """
+        with transaction.atomic():
+            incoming = other.cart_items.filter(line_key=OuterRef('line_key'))
+            self.cart_items.filter(Exists(incoming)).update(
+                quantity=F('quantity') + Subquery(incoming.values('quantity')[:1])
+            )
+            other.cart_items.filter(line_key__in=self.cart_items.values('line_key')).delete()
+            other.cart_items.update(cart=self)
+            if self.coupon_id is None and other.coupon_id is not None:
+                Cart.objects.filter(pk=self.pk).update(coupon=other.coupon_id)
+                self.coupon = other.coupon
+            Cart.objects.filter(pk=self.pk).recompute_totals()
+            other.delete()
+        self.refresh_from_db(fields=['item_count', 'subtotal', 'updated_at'])
+
     def get_cart_total(self):
-        cart_items = self.cart_items.all()
-        total = 0
-        for cart_item in cart_items:
-            total += cart_item.get_product_price()
-        return total
-    
+        """Sum of line prices, read from the stored subtotal"""
+        return self.subtotal
+
     def get_cart_total_after_discount(self):
         """Get cart total after applying coupon discount"""
-        total = self.get_cart_total()
-        if self.coupon and self.coupon.is_valid(total):
-            discount = self.coupon.discount_price
-            return max(0, total - discount)  # Ensure total doesn't go negative
-        return total
+        return max(0, self.get_cart_total() - self.get_discount_amount())  # Ensure total doesn't go negative
     
     def get_discount_amount(self):
         """Get the discount amount if coupon is applied"""
@@ -53,17 +147,72 @@ class Cart(BaseModel):
         return 0
 
 
+class CartItemsManager(models.Manager):
+
+    def add_quantity(self, cart, product_id, size_variant_id, color_variant_id, quantity):
+        """Insert a line or add `quantity` to the existing one in a single statement.
+
+        Returns True if the line was created: the row handed back carries the
+        uid generated here only when the insert went through. Concurrent adds
+        to the same line are summed by the database instead of overwriting
+        each other.
+        """
+        now = timezone.now()
+        values = {
+            'uid': uuid7(),
+            'create_at': now,
+            'updated_at': now,
+            'cart': cart.pk,
+            'product': product_id,
+            'size_variant': size_variant_id,
+            'color_variant': color_variant_id,
+            'quantity': quantity,
+            'line_key': line_key(product_id, size_variant_id, color_variant_id),
+        }
+        connection = connections[self.db]
+        fields = [self.model._meta.get_field(name) for name in values]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        sql = (
+            f'INSERT INTO {table} ({", ".join(qn(field.column) for field in fields)}) '
+            f'VALUES ({", ".join(["%s"] * len(fields))}) '
+            f'ON CONFLICT ({qn("cart_id")}, {qn("line_key")}) DO UPDATE SET '
+            f'{qn("quantity")} = {table}.{qn("quantity")} + excluded.{qn("quantity")}, '
+            f'{qn("updated_at")} = excluded.{qn("updated_at")} '
+            f'RETURNING {qn("uid")}'
+        )
+        params = [field.get_db_prep_save(values[field.name], connection) for field in fields]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            (stored,) = cursor.fetchone()
+        return self.model._meta.pk.to_python(stored) == values['uid']
+
+
 class CartItems(BaseModel):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="cart_items")
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
     size_variant = models.ForeignKey(SizeVariant, on_delete=models.SET_NULL, null=True, blank=True)
     color_variant = models.ForeignKey(ColorVariant, on_delete=models.SET_NULL, null=True, blank=True)
     quantity = models.IntegerField(default=1)
+    # See line_key(); unique per cart so the same line can't be added twice
+    line_key = models.CharField(max_length=100, editable=False)
+
+    objects = CartItemsManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'line_key'], name='unique_cart_line'),
+        ]
     
     def __str__(self) -> str:
         return f"{self.product.product_name if self.product else 'Deleted Product'} - {self.quantity}"
+
+    def save(self, *args, **kwargs):
+        if not self.line_key:
+            self.line_key = line_key(self.product_id, self.size_variant_id, self.color_variant_id)
+        super().save(*args, **kwargs)
     
-    def get_product_price(self):
+    def get_unit_price(self):
         if not self.product:
             return 0
         
@@ -75,7 +224,10 @@ class CartItems(BaseModel):
         if self.color_variant:
             price += self.color_variant.price
         
-        return price * self.quantity
+        return price
+
+    def get_product_price(self):
+        return self.get_unit_price() * self.quantity
 
 
 class Payment(BaseModel):
@@ -86,6 +238,74 @@ class Payment(BaseModel):
     amount = models.IntegerField()  # Amount in paise
     status = models.CharField(max_length=50, default='Created')  # Created, Success, Failed
     invoice_pdf = models.FileField(upload_to="invoices", null=True, blank=True)
+    # Set once when the payment succeeds; unlike updated_at, later saves leave it alone
+    paid_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['paid_at', 'uid'], name='payment_paid_idx'),
+        ]
     
     def __str__(self) -> str:
         return f"{self.cart} - {self.status} - ₹{self.amount/100}"
+
+
+
+# Catalog price changes and product or variant deletions move the subtotal of open carts holding them
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=SizeVariant)
+@receiver(post_save, sender=ColorVariant)
+def recompute_cart_totals_for_prices(sender, instance, created, **kwargs):
+    if created:
+        return
+    lookup = {Product: 'cart_items__product', SizeVariant: 'cart_items__size_variant',
+              ColorVariant: 'cart_items__color_variant'}[sender]
+    Cart.objects.filter(is_paid=False, pk__in=Cart.objects.filter(**{lookup: instance}).values('pk')).recompute_totals()
+
+
+@receiver(pre_delete, sender=Product)
+@receiver(pre_delete, sender=SizeVariant)
+@receiver(pre_delete, sender=ColorVariant)
+def remember_open_carts_for_delete(sender, instance, **kwargs):
+    lookup = {Product: 'cart_items__product', SizeVariant: 'cart_items__size_variant',
+              ColorVariant: 'cart_items__color_variant'}[sender]
+    instance._open_cart_ids = list(
+        Cart.objects.filter(is_paid=False, **{lookup: instance}).values_list('pk', flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=SizeVariant)
+@receiver(post_delete, sender=ColorVariant)
+def recompute_cart_totals_after_delete(sender, instance, **kwargs):
+    if getattr(instance, '_open_cart_ids', None):
+        Cart.objects.filter(pk__in=instance._open_cart_ids).recompute_totals()
+
+
+@receiver(user_logged_in)
+def merge_session_cart(sender, request, user, **kwargs):
+    """Carry the cart a visitor filled in before logging in over to their account."""
+    cart_id = request.session.get('cart_id')
+    if not cart_id:
+        return
+    try:
+        with transaction.atomic():
+            session_cart = Cart.objects.filter(uid=cart_id, user=None, is_paid=False).first()
+            if session_cart is not None:
+                user_cart = Cart.objects.filter(user=user, is_paid=False).first()
+                if user_cart is None:
+                    Cart.objects.filter(pk=session_cart.pk).update(user=user)
+                else:
+                    user_cart.merge(session_cart)
+    except Exception:
+        # Logging in must not fail over the cart; the session keeps it so the next login retries
+        logger.exception('Could not merge session cart %s into the cart of user %s', cart_id, user.pk)
+        return
+    request.session.pop('cart_id', None)
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def refresh_coupon_book(sender, instance, **kwargs):
+    bump_coupon_version()
@@ -113,7 +113,7 @@ def generate_invoice_pdf(payment):
     elements.append(Spacer(1, 0.3*inch))
     
     # Items Table
-    cart_items = cart.cart_items.all()
+    cart_items = cart.cart_items.select_related('product', 'size_variant', 'color_variant')
     items_data = [['Product', 'Size', 'Color', 'Quantity', 'Price']]
     
     for item in cart_items:
@@ -3,6 +3,7 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.conf import settings
+from django.utils import timezone
 from .models import Cart, Payment
 from .payment_utils import create_razorpay_order, verify_payment_signature, generate_invoice_pdf
 from .views import get_cart
@@ -14,12 +15,15 @@ def initiate_payment(request):
     """Initiate payment for cart"""
     try:
         cart = get_cart(request)
-        cart_items = cart.cart_items.all()
         
-        if not cart_items.exists():
+        if cart is None or not cart.cart_items.exists():
             messages.error(request, 'Your cart is empty')
             return redirect('cart')
         
+        # Charge exactly what is in the cart, not the running counters
+        Cart.objects.filter(pk=cart.pk).recompute_totals()
+        cart.refresh_from_db(fields=['item_count', 'subtotal'])
+        
         # Calculate amount in paise
         total_amount = cart.get_cart_total_after_discount()
         amount_in_paise = int(total_amount * 100)  # Convert to paise
@@ -96,6 +100,7 @@ def verify_payment(request):
         payment.razorpay_payment_id = razorpay_payment_id
         payment.razorpay_signature = razorpay_signature
         payment.status = 'Success'
+        payment.paid_at = payment.paid_at or timezone.now()
         payment.save()
         
         # Mark cart as paid
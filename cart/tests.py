@@ -1,3 +1,123 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import Client, TestCase, TransactionTestCase
+
+from products.models import Category, ColorVariant, Product, SizeVariant
+from .models import Cart, CartItems, LINE_PRICE
+
+
+class ConcurrentAddToCartTests(TransactionTestCase):
+    """Many clients adding the same product to one cart at once."""
+
+    THREADS = 8
+    ADDS_PER_THREAD = 5
+
+    def setUp(self):
+        category = Category.objects.create(category_name='Shirts')
+        self.size = SizeVariant.objects.create(size='M', price=50)
+        self.color = ColorVariant.objects.create(color_name='Red', price=25)
+        self.product = Product.objects.create(product_name='Plain Shirt', category=category, price=500)
+        self.product.size_variant.add(self.size)
+        self.product.color_variant.add(self.color)
+        self.user = User.objects.create_user('buyer@example.com', 'buyer@example.com', 'secret')
+
+    def hammer(self, post):
+        """Run `post(client)` from many threads at once; returns the responses that succeeded."""
+        barrier = threading.Barrier(self.THREADS, timeout=30)
+        succeeded = []
+        lock = threading.Lock()
+        clients = []
+        for _ in range(self.THREADS):
+            client = Client()
+            client.force_login(self.user)
+            clients.append(client)
+
+        def worker(client):
+            try:
+                barrier.wait()
+                for _ in range(self.ADDS_PER_THREAD):
+                    response = post(client)
+                    if response.status_code == 200 and response.json()['success']:
+                        with lock:
+                            succeeded.append(response)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return succeeded
+
+    def add(self, client):
+        return client.post('/cart/add/', {
+            'product_slug': self.product.slug, 'size': 'M', 'color': 'Red', 'quantity': 1,
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_concurrent_adds_keep_one_cart_one_line_and_every_increment(self):
+        succeeded = self.hammer(self.add)
+
+        self.assertEqual(len(succeeded), self.THREADS * self.ADDS_PER_THREAD)
+        carts = Cart.objects.filter(user=self.user, is_paid=False)
+        self.assertEqual(carts.count(), 1)
+        cart = carts.get()
+        line = CartItems.objects.get(cart=cart)
+        self.assertEqual(line.quantity, len(succeeded))
+
+        totals = cart.cart_items.aggregate(lines=Count('pk'), subtotal=Sum(LINE_PRICE))
+        self.assertEqual(cart.item_count, totals['lines'])
+        self.assertEqual(cart.subtotal, totals['subtotal'])
+        self.assertEqual(cart.subtotal, 575 * len(succeeded))
+
+
+class AddToCartTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(category_name='Shirts')
+        self.product = Product.objects.create(product_name='Plain Shirt', category=category, price=500)
+        self.cart = Cart.objects.create()
+
+    def test_add_quantity_reports_created_only_for_new_lines(self):
+        # An existing line whose quantity happens to equal the added amount is not new
+        CartItems.objects.create(cart=self.cart, product=self.product, quantity=0)
+        created = CartItems.objects.add_quantity(self.cart, self.product.pk, None, None, 3)
+        self.assertFalse(created)
+        self.assertEqual(CartItems.objects.get(cart=self.cart).quantity, 3)
+
+        other = Cart.objects.create()
+        self.assertTrue(CartItems.objects.add_quantity(other, self.product.pk, None, None, 3))
+
+    def test_add_to_cart_rejects_non_positive_quantities(self):
+        for quantity in (0, -2):
+            response = self.client.post('/cart/add/', {
+                'product_slug': self.product.slug, 'quantity': quantity,
+            }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItems.objects.exists())
+
+
+class CartTotalsTests(TestCase):
+    """The denormalized counters follow deletes of the catalog rows they were computed from."""
+
+    def setUp(self):
+        category = Category.objects.create(category_name='Shirts')
+        self.product = Product.objects.create(product_name='Plain Shirt', category=category, price=500)
+        self.size = SizeVariant.objects.create(size='M', price=40)
+        self.color = ColorVariant.objects.create(color_name='Red', price=200)
+        self.product.size_variant.add(self.size)
+        self.product.color_variant.add(self.color)
+        self.client.post('/cart/add/', {'product_slug': self.product.slug, 'size': 'M', 'color': 'Red', 'quantity': 1})
+        self.cart = Cart.objects.get()
+
+    def test_deleting_a_variant_recomputes_open_carts(self):
+        self.assertEqual(self.cart.subtotal, 740)
+        self.color.delete()
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.subtotal, 540)
+        self.size.delete()
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.subtotal, 500)
@@ -1,38 +1,46 @@
+import json
+import uuid
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from .coupons import get_coupon_book, normalize_code
 from .models import Cart, CartItems, Coupon
-from products.models import Product, SizeVariant, ColorVariant
+from products.models import Product, ProductImage, ProductSKU
+
 
+def get_cart(request, create=False):
+    """The visitor's open cart, or None if they have none and `create` is False.
 
-def get_cart(request):
+    Read paths (cart badge, cart page) never create anything, so browsing
+    writes no cart or session rows; add_to_cart is the first to create them.
+    """
     if request.user.is_authenticated:
-        cart, _ = Cart.objects.get_or_create(user=request.user, is_paid=False)
-    else:
-        # For anonymous users, use session-based cart
-        if not request.session.session_key:
-            request.session.create()
-        
-        cart_id = request.session.get('cart_id')
-        if cart_id:
-            try:
-                cart = Cart.objects.get(uid=cart_id, user=None, is_paid=False)
-            except Cart.DoesNotExist:
-                cart = Cart.objects.create(user=None, is_paid=False)
-                request.session['cart_id'] = str(cart.uid)
-        else:
-            cart = Cart.objects.create(user=None, is_paid=False)
-            request.session['cart_id'] = str(cart.uid)
-    
+        carts = Cart.objects.select_related('coupon')
+        if create:
+            cart, _ = carts.get_or_create(user=request.user, is_paid=False)
+            return cart
+        return carts.filter(user=request.user, is_paid=False).first()
+
+    # For anonymous users, use session-based cart
+    cart_id = request.session.get('cart_id')
+    cart = None
+    if cart_id:
+        cart = Cart.objects.select_related('coupon').filter(uid=cart_id, user=None, is_paid=False).first()
+    if cart is None and create:
+        cart = Cart.objects.create(user=None, is_paid=False)
+        request.session['cart_id'] = str(cart.uid)
     return cart
 
 
 def get_cart_count(request):
     """Get cart count for AJAX requests"""
     cart = get_cart(request)
-    count = cart.cart_items.count()
-    return JsonResponse({'count': count})
+    return JsonResponse({'count': cart.item_count if cart else 0})
 
 
 @require_POST
@@ -42,44 +50,31 @@ def add_to_cart(request):
         size = request.POST.get('size', '')
         color = request.POST.get('color', '')
         quantity = int(request.POST.get('quantity', 1))
+        if quantity <= 0:
+            raise ValueError('Quantity must be positive')
         
-        product = get_object_or_404(Product, slug=product_slug)
-        cart = get_cart(request)
-        
-        # Get size and color variants if provided
-        size_variant = None
-        color_variant = None
-        
-        if size:
-            try:
-                size_variant = SizeVariant.objects.get(size=size)
-            except SizeVariant.DoesNotExist:
-                pass
-        
-        if color:
-            try:
-                color_variant = ColorVariant.objects.get(color_name=color)
-            except ColorVariant.DoesNotExist:
-                pass
-        
-        # Check if cart item with same product, size, and color already exists
-        cart_item, created = CartItems.objects.get_or_create(
-            cart=cart,
-            product=product,
-            size_variant=size_variant,
-            color_variant=color_variant,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        # One indexed read resolves the product and its size/color variants
+        try:
+            sku = ProductSKU.objects.select_related('product').get(
+                product__slug=product_slug, size=size, color=color
+            )
+        except ProductSKU.DoesNotExist:
+            get_object_or_404(Product, slug=product_slug)
+            raise ValueError('Selected size/color combination is not available')
+        cart = get_cart(request, create=True)
+        
+        # Insert the line, or add to the existing one for the same product, size and color
+        with transaction.atomic():
+            created = CartItems.objects.add_quantity(
+                cart, sku.product_id, sku.size_variant_id, sku.color_variant_id, quantity
+            )
+            cart.add_to_totals(lines=1 if created else 0, amount=sku.price * quantity)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
                 'success': True,
                 'message': 'Product added to cart successfully',
-                'cart_count': cart.cart_items.count()
+                'cart_count': cart.item_count
             })
         
         messages.success(request, 'Product added to cart successfully')
@@ -94,20 +89,28 @@ def add_to_cart(request):
 
 def cart_view(request):
     cart = get_cart(request)
-    cart_items = cart.cart_items.all()
+    if cart is None:
+        # Nothing added yet; render an empty cart without creating one
+        cart, cart_items = Cart(), CartItems.objects.none()
+    else:
+        # Everything each row renders comes from these two queries
+        cart_items = cart.cart_items.select_related(
+            'product', 'size_variant', 'color_variant'
+        ).prefetch_related(
+            Prefetch('product__product_images', queryset=ProductImage.objects.order_by('create_at')[:1], to_attr='primary_images')
+        )
     cart_total = cart.get_cart_total()
     
-    # Get all active coupons
-    all_coupons = Coupon.objects.filter(is_expired=False).order_by('-discount_price')
-    
-    # Get applicable coupons (where cart total >= minimum_amount)
-    applicable_coupons = [coupon for coupon in all_coupons if coupon.is_valid(cart_total)]
+    # Best applicable coupons and the next ones to unlock, from the in-process coupon book
+    coupon_book = get_coupon_book()
+    applicable_coupons = coupon_book.applicable(cart_total)
     
     context = {
         'cart': cart,
         'cart_items': cart_items,
-        'all_coupons': all_coupons,
         'applicable_coupons': applicable_coupons,
+        'best_coupon': applicable_coupons[0] if applicable_coupons else None,
+        'locked_coupons': coupon_book.locked(cart_total),
     }
     return render(request, 'cart/cart.html', context)
 
@@ -116,7 +119,10 @@ def cart_view(request):
 def remove_from_cart(request, cart_item_uid):
     
     try:
-        cart_item = get_object_or_404(CartItems, uid=cart_item_uid)
+        cart_item = get_object_or_404(
+            CartItems.objects.select_related('cart__coupon', 'product', 'size_variant', 'color_variant'),
+            uid=cart_item_uid,
+        )
         cart = cart_item.cart
         
         # Check if user owns this cart
@@ -134,10 +140,13 @@ def remove_from_cart(request, cart_item_uid):
                 messages.error(request, 'You do not have permission to remove this item')
                 return redirect('cart')
         
-        cart_item.delete()
-        
-        # Refresh cart from database to get updated total
-        cart.refresh_from_db()
+        with transaction.atomic():
+            # Re-read the quantity under a row lock; a repeated click finds the line gone and changes nothing
+            line = CartItems.objects.select_for_update().filter(pk=cart_item.pk)
+            quantity = line.values_list('quantity', flat=True).first()
+            if quantity is not None:
+                line.delete()
+                cart.add_to_totals(lines=-1, amount=-cart_item.get_unit_price() * quantity)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
@@ -161,7 +170,10 @@ def remove_from_cart(request, cart_item_uid):
 @require_POST
 def update_cart_item(request, cart_item_uid):
     try:
-        cart_item = get_object_or_404(CartItems, uid=cart_item_uid)
+        cart_item = get_object_or_404(
+            CartItems.objects.select_related('cart__coupon', 'product', 'size_variant', 'color_variant'),
+            uid=cart_item_uid,
+        )
         cart = cart_item.cart
         
         # Check if user owns this cart
@@ -174,13 +186,21 @@ def update_cart_item(request, cart_item_uid):
                 return JsonResponse({'success': False, 'message': 'Permission denied'}, status=403)
         
         quantity = int(request.POST.get('quantity', 1))
-        if quantity <= 0:
-            cart_item.delete()
-            item_total = 0
-        else:
-            cart_item.quantity = quantity
-            cart_item.save()
-            item_total = cart_item.get_product_price()
+        with transaction.atomic():
+            # Re-read the quantity under a row lock so concurrent updates adjust the totals in turn
+            line = CartItems.objects.select_for_update().filter(pk=cart_item.pk)
+            previous_quantity = line.values_list('quantity', flat=True).first()
+            if previous_quantity is None:
+                raise CartItems.DoesNotExist('Cart item no longer exists')
+            unit_price = cart_item.get_unit_price()
+            if quantity <= 0:
+                line.delete()
+                item_total = 0
+                cart.add_to_totals(lines=-1, amount=-unit_price * previous_quantity)
+            else:
+                line.update(quantity=quantity, updated_at=timezone.now())
+                item_total = unit_price * quantity
+                cart.add_to_totals(amount=unit_price * (quantity - previous_quantity))
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             response_data = {
@@ -206,10 +226,22 @@ def update_cart_item(request, cart_item_uid):
         return redirect('cart')
 
 
+def coupon_error(coupon, cart_total):
+    """Why `coupon` can't be applied to a cart of `cart_total`."""
+    now = timezone.now()
+    if coupon.is_expired or (coupon.valid_until and now >= coupon.valid_until):
+        return 'This coupon has expired'
+    if coupon.valid_from and now < coupon.valid_from:
+        return 'This coupon is not active yet'
+    if cart_total < coupon.minimum_amount:
+        return f'Minimum order amount of ₹{coupon.minimum_amount} required for this coupon'
+    return 'This coupon is not valid'
+
+
 @require_POST
 def apply_coupon(request):
     try:
-        coupon_code = request.POST.get('coupon_code', '').strip().upper()
+        coupon_code = normalize_code(request.POST.get('coupon_code'))
         
         if not coupon_code:
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -218,10 +250,15 @@ def apply_coupon(request):
             return redirect('cart')
         
         cart = get_cart(request)
+        if cart is None:
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return JsonResponse({'success': False, 'message': 'Your cart is empty'}, status=400)
+            messages.error(request, 'Your cart is empty')
+            return redirect('cart')
         cart_total = cart.get_cart_total()
         
         try:
-            coupon = Coupon.objects.get(coupon_code__iexact=coupon_code)
+            coupon = Coupon.objects.get(coupon_code=coupon_code)
         except Coupon.DoesNotExist:
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({'success': False, 'message': 'Invalid coupon code'}, status=400)
@@ -230,21 +267,16 @@ def apply_coupon(request):
         
         # Check if coupon is valid
         if not coupon.is_valid(cart_total):
-            if coupon.is_expired:
-                message = 'This coupon has expired'
-            elif cart_total < coupon.minimum_amount:
-                message = f'Minimum order amount of ₹{coupon.minimum_amount} required for this coupon'
-            else:
-                message = 'This coupon is not valid'
+            message = coupon_error(coupon, cart_total)
             
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({'success': False, 'message': message}, status=400)
             messages.error(request, message)
             return redirect('cart')
         
-        # Apply coupon
+        # Apply coupon; the counters may have moved since the cart was read, so leave them alone
         cart.coupon = coupon
-        cart.save()
+        cart.save(update_fields=['coupon', 'updated_at'])
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
@@ -270,6 +302,11 @@ def apply_coupon(request):
 def remove_coupon(request):
     try:
         cart = get_cart(request)
+        if cart is None:
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return JsonResponse({'success': False, 'message': 'Your cart is empty'}, status=400)
+            messages.error(request, 'Your cart is empty')
+            return redirect('cart')
         
         # Check if user owns this cart
         if request.user.is_authenticated:
@@ -288,7 +325,7 @@ def remove_coupon(request):
         
         removed_coupon = cart.coupon
         cart.coupon = None
-        cart.save()
+        cart.save(update_fields=['coupon', 'updated_at'])
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
@@ -306,3 +343,130 @@ def remove_coupon(request):
             return JsonResponse({'success': False, 'message': str(e)}, status=400)
         messages.error(request, f'Error: {str(e)}')
         return redirect('cart')
+
+
+MAX_BATCH_OPERATIONS = 100
+
+
+class BatchError(Exception):
+    def __init__(self, index, message):
+        super().__init__(message)
+        self.index = index
+
+
+@require_POST
+def cart_batch(request):
+    """Apply a list of cart operations in one transaction and return the resulting cart.
+
+    Body: {"operations": [{"op": "add", "product_slug": ..., "size": ..., "color": ..., "quantity": 1},
+    {"op": "update", "item": <uid>, "quantity": 2}, {"op": "remove", "item": <uid>},
+    {"op": "apply_coupon", "code": ...}, {"op": "remove_coupon"}]}. If any operation
+    fails, none is applied.
+    """
+    try:
+        operations = json.loads(request.body)['operations']
+        if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'message': 'Expected {"operations": [...]}'}, status=400)
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return JsonResponse({
+            'success': False, 'message': f'At most {MAX_BATCH_OPERATIONS} operations per request'
+        }, status=400)
+
+    try:
+        with transaction.atomic():
+            cart = apply_operations(request, operations)
+    except BatchError as e:
+        return JsonResponse({'success': False, 'message': str(e), 'operation': e.index}, status=400)
+
+    items = cart.cart_items.select_related('product', 'size_variant', 'color_variant') if cart else []
+    return JsonResponse({
+        'success': True,
+        'cart_count': cart.item_count if cart else 0,
+        'cart_total': cart.get_cart_total() if cart else 0,
+        'cart_total_after_discount': cart.get_cart_total_after_discount() if cart else 0,
+        'discount_amount': cart.get_discount_amount() if cart else 0,
+        'coupon_code': cart.coupon.coupon_code if cart and cart.coupon else None,
+        'items': [
+            {'uid': str(item.uid), 'quantity': item.quantity, 'item_total': item.get_product_price()}
+            for item in items
+        ],
+    })
+
+
+def parse_uid(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def apply_operations(request, operations):
+    """Apply `operations` to the visitor's cart, recomputing its totals once at the end."""
+    cart = get_cart(request, create=any(op.get('op') == 'add' for op in operations))
+    if cart is None:
+        if operations:
+            raise BatchError(0, 'Your cart is empty')
+        return None
+
+    # The visitor's own cart scopes every lookup, so this is the only ownership check
+    item_uids = {parse_uid(op.get('item')) for op in operations if op.get('op') in ('update', 'remove')}
+    item_uids.discard(None)
+    items = {}
+    if item_uids:
+        items = {item.uid: item for item in cart.cart_items.filter(uid__in=item_uids)}
+
+    skus = {}
+    adds = [op for op in operations if op.get('op') == 'add']
+    if adds:
+        lookup = Q()
+        for op in adds:
+            lookup |= Q(product__slug=op.get('product_slug'), size=op.get('size', ''), color=op.get('color', ''))
+        for sku in ProductSKU.objects.filter(lookup).select_related('product'):
+            skus[sku.product.slug, sku.size, sku.color] = sku
+
+    coupon, coupon_index = cart.coupon, None
+    removed = set()
+    for index, op in enumerate(operations):
+        kind = op.get('op')
+        try:
+            quantity = int(op.get('quantity', 1))
+        except (TypeError, ValueError):
+            raise BatchError(index, 'Quantity must be a number')
+
+        if kind == 'add':
+            sku = skus.get((op.get('product_slug'), op.get('size', ''), op.get('color', '')))
+            if sku is None:
+                raise BatchError(index, 'Selected size/color combination is not available')
+            if quantity <= 0:
+                raise BatchError(index, 'Quantity must be positive')
+            CartItems.objects.add_quantity(cart, sku.product_id, sku.size_variant_id, sku.color_variant_id, quantity)
+        elif kind in ('update', 'remove'):
+            item = items.get(parse_uid(op.get('item')))
+            if item is None:
+                raise BatchError(index, 'Cart item not found')
+            if item.pk in removed:
+                raise BatchError(index, 'Cart item was removed earlier in this batch')
+            if kind == 'remove' or quantity <= 0:
+                CartItems.objects.filter(pk=item.pk).delete()
+                removed.add(item.pk)
+            else:
+                CartItems.objects.filter(pk=item.pk).update(quantity=quantity, updated_at=timezone.now())
+        elif kind == 'apply_coupon':
+            code = normalize_code(str(op.get('code', '')))
+            coupon = Coupon.objects.filter(coupon_code=code).first() if code else None
+            if coupon is None:
+                raise BatchError(index, 'Invalid coupon code')
+            coupon_index = index
+        elif kind == 'remove_coupon':
+            coupon = None
+        else:
+            raise BatchError(index, f'Unknown operation: {kind}')
+
+    Cart.objects.filter(pk=cart.pk).recompute_totals(coupon=coupon, updated_at=timezone.now())
+    cart.refresh_from_db()
+    # A coupon applied in this batch must hold for the cart as it now stands
+    if coupon_index is not None and cart.coupon and not cart.coupon.is_valid(cart.subtotal):
+        raise BatchError(coupon_index, coupon_error(cart.coupon, cart.subtotal))
+    return cart
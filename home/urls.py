@@ -1,7 +1,8 @@
 from django.urls import path
-from home.views import index, search
+from home.views import index, search, search_suggest
 
 urlpatterns = [
     path('', index, name="index"),
     path('search/', search, name="search"),
+    path('search/suggest/', search_suggest, name="search_suggest"),
 ]
@@ -1,11 +1,23 @@
-from django.shortcuts import render
-from products.models import Product, Category
+from urllib.parse import quote
+from django.shortcuts import render, redirect
+from django.http import JsonResponse
+from django.views.decorators.http import condition
+from products.models import Product
+from products.catalog import get_catalog
+from products.conditional import catalog_etag, catalog_last_modified
+from products.pagination import InvalidCursor
+from products.search import SearchResults
+from products.suggest import suggest
+
+SEARCH_PAGE_SIZE = 24
 
 
 # Create your views here.
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
 def index(request):
-    products = Product.objects.all()[:12]  # Show 12 products on homepage
-    categories = Category.objects.all()
+    # 12 most popular products, read off the popularity index
+    products = Product.objects.for_listing().order_by('-popularity', '-uid')[:12]
+    categories = get_catalog().categories
     context = {
         'products': products,
         'categories': categories
@@ -15,17 +27,22 @@ def index(request):
 
 def search(request):
     query = request.GET.get('q', '').strip()
-    products = Product.objects.none()
-    
-    if query:
-        products = Product.objects.filter(
-            product_name__icontains=query
-        ) | Product.objects.filter(
-            product_description__icontains=query
-        )
+    results = SearchResults(query, Product.objects.for_listing())
+    try:
+        page = results.page(request.GET.get('cursor'), page_size=SEARCH_PAGE_SIZE)
+    except InvalidCursor:
+        return redirect(f'{request.path}?q={quote(query)}')
     
     context = {
-        'products': products,
+        'products': page.object_list,
+        'page': page,
+        'result_count': results.count(),
         'query': query
     }
-    return render(request, 'home/search.html', context)
\ No newline at end of file
+    return render(request, 'home/search.html', context)
+
+
+def search_suggest(request):
+    """Autocomplete suggestions for the header search box, served from memory"""
+    query = request.GET.get('q', '').strip()
+    return JsonResponse({'query': query, 'suggestions': suggest(query) if query else []})
@@ -23,3 +23,9 @@ class SizeVariantAdmin(admin.ModelAdmin):
 admin.site.register(Product, ProductAdmin)
 
 admin.site.register(ProductImage)
+
+@admin.register(ProductSKU)
+class ProductSKUAdmin(admin.ModelAdmin):
+    list_display = ['product', 'size', 'color', 'price']
+    search_fields = ['product__product_name']
+    readonly_fields = ['product', 'size_variant', 'color_variant', 'size', 'color', 'base_price', 'size_price', 'color_price', 'price']
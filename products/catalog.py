@@ -0,0 +1,107 @@
+"""
+Catalog version stamp and process-local catalog snapshot.
+
+Any change to categories, products, variants or images bumps the version
+held in the shared cache (after the transaction commits). Process-local
+structures built from the catalog, such as `get_catalog()`, remember the
+version they were built at and rebuild lazily once it moves on, so every
+worker serves fresh data after an admin edit without querying per request.
+
+That only holds if every worker sees the same cache. LocMemCache is private
+to one process, so it is fine for `runserver` and single-process deployments;
+anything else needs a shared backend, and `check --deploy` warns otherwise.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def get_catalog_version():
+    """Current catalog version: a nanosecond timestamp of the last change."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    transaction.on_commit(lambda: cache.set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None))
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend.endswith('LocMemCache'):
+        return [checks.Warning(
+            'The default cache is LocMemCache, so catalog version bumps are only seen by the process that made them.',
+            hint='Use a shared backend such as Redis or Memcached when running more than one worker process.',
+            id='products.W001',
+        )]
+    return []
+
+
+class CatalogLocal:
+    """A process-local value built by `builder`, rebuilt when the catalog version changes.
+
+    Other shared data can pass its own `version` callable.
+    """
+
+    def __init__(self, builder, version=get_catalog_version):
+        self.builder = builder
+        self.version = version
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+
+    def clear(self):
+        """Rebuild on the next get() even if the version hasn't moved."""
+        self._version = None
+
+    def get(self):
+        version = self.version()
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._value = self.builder()
+                    self._version = version
+        return self._value
+
+
+class CatalogSnapshot:
+    """Categories and variant tables, small enough to keep in every worker."""
+
+    def __init__(self, categories, size_variants, color_variants):
+        self.categories = categories
+        self.size_variants = size_variants
+        self.color_variants = color_variants
+        self.categories_by_slug = {category.slug: category for category in categories}
+        self.category_ids_by_slug = {category.slug: category.pk for category in categories}
+        # Changes whenever any variant's name or price does; part of fragment cache keys
+        self.variants_version = max(
+            (variant.updated_at.timestamp() for variant in size_variants + color_variants), default=0
+        )
+
+
+def _build_snapshot():
+    from .models import Category, ColorVariant, SizeVariant
+
+    return CatalogSnapshot(
+        categories=list(Category.objects.order_by('create_at')),
+        size_variants=list(SizeVariant.objects.order_by('create_at')),
+        color_variants=list(ColorVariant.objects.order_by('create_at')),
+    )
+
+
+_snapshot = CatalogLocal(_build_snapshot)
+
+
+def get_catalog():
+    return _snapshot.get()
@@ -0,0 +1,64 @@
+"""
+Validators for conditional GETs of catalog pages.
+
+Each page's ETag combines a catalog timestamp (the product's own `updated_at`
+or the catalog version, which moves on any catalog change) with everything
+else the rendered HTML depends on: the query string, the logged-in user, the
+cart badge and the CSRF secret embedded in forms. All of it is available
+without rendering, so unchanged pages are answered with 304 Not Modified.
+
+Pending flash messages are shown once by the next page rendered, so requests
+that carry any always get a full response. A Last-Modified date can't stand
+for the viewer state, so it is only offered to visitors without any; other
+clients revalidate with the ETag alone.
+"""
+
+from datetime import datetime, timezone
+import hashlib
+
+from django.contrib.messages import get_messages
+
+from .catalog import get_catalog_version
+
+
+def viewer_state(request):
+    """The parts of a page that differ between visitors looking at the same URL."""
+    from cart.context_processors import cart_count
+
+    user = request.user.pk if request.user.is_authenticated else ''
+    csrf_secret = request.META.get('CSRF_COOKIE', '')
+    return f'{user}:{cart_count(request)["cart_count"]}:{csrf_secret}'
+
+
+def has_pending_messages(request):
+    # len() doesn't mark the messages as seen; rendering them does
+    return len(get_messages(request)) > 0
+
+
+def has_viewer_state(request):
+    """True when the page differs from the one a first-time anonymous visitor gets."""
+    return viewer_state(request) != ':0:' or has_pending_messages(request)
+
+
+def make_etag(request, stamp):
+    if has_pending_messages(request):
+        return None
+    key = f'{stamp}|{request.get_full_path()}|{viewer_state(request)}'
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def make_last_modified(request, modified):
+    return None if has_viewer_state(request) else modified
+
+
+def from_timestamp(seconds):
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+def catalog_etag(request, *args, **kwargs):
+    """ETag for pages listing many catalog objects (home, category listings)."""
+    return make_etag(request, get_catalog_version())
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return make_last_modified(request, from_timestamp(get_catalog_version() / 1e9))
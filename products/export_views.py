@@ -0,0 +1,33 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from base.exports import EXPORT_CHUNK_SIZE, export_response
+from .models import Product
+
+# Same columns import_catalog reads, so an export can be fed straight back in
+PRODUCT_EXPORT_COLUMNS = ['uid', 'slug', 'product_name', 'category', 'price', 'description', 'sizes', 'colors', 'create_at']
+
+
+def _product_rows():
+    products = (
+        Product.objects.select_related('category')
+        .prefetch_related('size_variant', 'color_variant')
+        .order_by()
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for product in products:
+        yield (
+            product.uid,
+            product.slug,
+            product.product_name,
+            product.category.category_name,
+            product.price,
+            product.product_description,
+            '|'.join(variant.size for variant in product.size_variant.all()),
+            '|'.join(variant.color_name for variant in product.color_variant.all()),
+            product.create_at.isoformat(),
+        )
+
+
+@staff_member_required
+def export_products(request):
+    """Stream every product with its variants as CSV or JSONL"""
+    return export_response(request, 'products', PRODUCT_EXPORT_COLUMNS, _product_rows())
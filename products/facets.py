@@ -0,0 +1,230 @@
+"""
+In-memory facet index for category listings.
+
+Each category's products are numbered 0..n-1 and every facet value (price
+band, size, color) becomes a Python int used as a bitset of those numbers.
+Filtering is a handful of AND/OR operations on the bitsets and each facet
+count is one popcount, so neither depends on a GROUP BY over the variant
+tables. Listings are paged from per-sort orderings kept in the same index,
+with the same keyset cursors the unfiltered listing uses.
+
+Indexes are built per category on first use and thrown away whenever the
+catalog version changes.
+"""
+
+from collections import namedtuple
+import threading
+import uuid
+
+from .catalog import CatalogLocal, get_catalog
+from .pagination import InvalidCursor, KeysetPage, decode_cursor, encode_cursor
+
+# Price band key -> (label, lower bound inclusive, upper bound exclusive or None)
+PRICE_BANDS = {
+    '0-500': ('Under ₹500', 0, 500),
+    '500-1000': ('₹500 - ₹1,000', 500, 1000),
+    '1000-2500': ('₹1,000 - ₹2,500', 1000, 2500),
+    '2500-5000': ('₹2,500 - ₹5,000', 2500, 5000),
+    '5000-': ('₹5,000 & above', 5000, None),
+}
+
+FACETS = ('price', 'size', 'color')
+
+FacetValue = namedtuple('FacetValue', 'value label count selected')
+
+
+def price_band(price):
+    for key, (_label, low, high) in PRICE_BANDS.items():
+        if price >= low and (high is None or price < high):
+            return key
+    return None
+
+
+def _ordered(rows, ordering):
+    """Row numbers of `rows` in `ordering` (field names, '-' for descending)."""
+    order = list(range(len(rows)))
+    # Stable multi-pass sort, least significant key first
+    for field in reversed(ordering):
+        name = field.lstrip('-')
+        order.sort(key=lambda i: getattr(rows[i], name), reverse=field.startswith('-'))
+    return order
+
+
+class FacetIndex:
+
+    def __init__(self, rows, variants, sorts):
+        # rows: products of one category (uid, price and every sort field)
+        # variants: (product uid, size, color) for each of their SKUs
+        self.rows = rows
+        self.sorts = sorts
+        self.numbers = {row.uid: i for i, row in enumerate(rows)}
+        self.all_bits = (1 << len(rows)) - 1
+
+        self.bits = {facet: {} for facet in FACETS}
+        for i, row in enumerate(rows):
+            band = price_band(row.price)
+            if band is not None:
+                self.bits['price'][band] = self.bits['price'].get(band, 0) | (1 << i)
+        for product_uid, size, color in variants:
+            number = self.numbers.get(product_uid)
+            if number is None:
+                # Created after the products were read; it joins at the next rebuild
+                continue
+            bit = 1 << number
+            if size:
+                self.bits['size'][size] = self.bits['size'].get(size, 0) | bit
+            if color:
+                self.bits['color'][color] = self.bits['color'].get(color, 0) | bit
+
+        self.orders = {}
+        self.ranks = {}
+        for sort, ordering in sorts.items():
+            order = _ordered(rows, ordering)
+            rank = [0] * len(rows)
+            for position, i in enumerate(order):
+                rank[i] = position
+            self.orders[sort] = order
+            self.ranks[sort] = rank
+
+    def _union(self, facet, values):
+        bits = 0
+        for value in values:
+            bits |= self.bits[facet].get(value, 0)
+        return bits
+
+    def mask(self, selected, exclude=None):
+        """Bitset of products matching every selected facet (ORed within a facet), bar `exclude`."""
+        bits = self.all_bits
+        for facet, values in selected.items():
+            if values and facet != exclude:
+                bits &= self._union(facet, values)
+        return bits
+
+    def counts(self, selected, facet):
+        """{value: count} for one facet, given the selections in the other facets."""
+        others = self.mask(selected, exclude=facet)
+        return {value: (bits & others).bit_count() for value, bits in self.bits[facet].items()}
+
+    def page(self, mask, sort, cursor=None, page_size=24):
+        """Keyset page of product uids among `mask`, walking the precomputed `sort` order."""
+        ordering = self.sorts[sort]
+        order = self.orders[sort]
+        direction = 'next'
+        start = None
+        if cursor:
+            cursor_sort, values, direction = decode_cursor(cursor)
+            if cursor_sort != sort or len(values) != len(ordering):
+                raise InvalidCursor(cursor)
+            try:
+                number = self.numbers[uuid.UUID(hex=str(values[-1]))]
+            except (KeyError, ValueError):
+                # Malformed, or the boundary product is gone since the index was rebuilt
+                raise InvalidCursor(cursor)
+            start = self.ranks[sort][number]
+
+        forward = direction == 'next'
+        if forward:
+            positions = range(0 if start is None else start + 1, len(order))
+        else:
+            positions = range(start - 1, -1, -1)
+        found = []
+        for position in positions:
+            i = order[position]
+            if mask >> i & 1:
+                found.append(i)
+                if len(found) > page_size:
+                    break
+        has_more = len(found) > page_size
+        found = found[:page_size]
+        if not forward:
+            found.reverse()
+
+        next_cursor = prev_cursor = None
+        if found:
+            if (has_more if forward else start is not None):
+                next_cursor = encode_cursor(sort, self._key_values(found[-1], ordering), 'next')
+            if (start is not None if forward else has_more):
+                prev_cursor = encode_cursor(sort, self._key_values(found[0], ordering), 'prev')
+        return KeysetPage([self.rows[i].uid for i in found], sort, next_cursor, prev_cursor)
+
+    def _key_values(self, i, ordering):
+        row = self.rows[i]
+        return [getattr(row, field.lstrip('-')) for field in ordering]
+
+
+def build_facet_index(category_id, sorts):
+    from .models import Product, ProductSKU
+
+    fields = ['uid', 'price']
+    for ordering in sorts.values():
+        fields += [field.lstrip('-') for field in ordering if field.lstrip('-') not in fields]
+    Row = namedtuple('Row', fields)
+    rows = [
+        Row(*values)
+        for values in Product.objects.filter(category_id=category_id).values_list(*fields).iterator(chunk_size=5000)
+    ]
+    variants = ProductSKU.objects.filter(product__category_id=category_id).exclude(
+        size='', color=''
+    ).values_list('product_id', 'size', 'color')
+    return FacetIndex(rows, variants.iterator(chunk_size=5000), sorts)
+
+
+class _FacetIndexes:
+    """Facet indexes of the categories used so far in this catalog version."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # One lock per category, so building one index doesn't hold up the others
+        self.category_locks = {}
+        self.by_category = {}
+
+
+_indexes = CatalogLocal(_FacetIndexes)
+
+
+def get_facet_index(category_id, sorts):
+    indexes = _indexes.get()
+    index = indexes.by_category.get(category_id)
+    if index is None:
+        with indexes.lock:
+            category_lock = indexes.category_locks.setdefault(category_id, threading.Lock())
+        with category_lock:
+            index = indexes.by_category.get(category_id)
+            if index is None:
+                index = indexes.by_category[category_id] = build_facet_index(category_id, sorts)
+    return index
+
+
+def parse_selection(query_dict):
+    """Selected facet values from request GET parameters, unknown values dropped."""
+    catalog = get_catalog()
+    known = {
+        'price': set(PRICE_BANDS),
+        'size': {variant.size for variant in catalog.size_variants},
+        'color': {variant.color_name for variant in catalog.color_variants},
+    }
+    return {
+        facet: [value for value in dict.fromkeys(query_dict.getlist(facet)) if value in known[facet]]
+        for facet in FACETS
+    }
+
+
+def facet_values(index, selected):
+    """Per-facet lists of FacetValue for the template, in catalog order; empty values omitted."""
+    catalog = get_catalog()
+    labels = {
+        'price': [(key, label) for key, (label, _low, _high) in PRICE_BANDS.items()],
+        'size': [(variant.size, variant.size) for variant in catalog.size_variants],
+        'color': [(variant.color_name, variant.color_name) for variant in catalog.color_variants],
+    }
+    facets = {}
+    for facet in FACETS:
+        counts = index.counts(selected, facet)
+        seen = set()
+        values = []
+        for value, label in labels[facet]:
+            if value in counts and value not in seen:
+                seen.add(value)
+                values.append(FacetValue(value, label, counts[value], value in selected[facet]))
+        facets[facet] = values
+    return facets
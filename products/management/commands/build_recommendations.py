@@ -0,0 +1,32 @@
+"""
+Management command to build "frequently bought together" recommendations
+Run: python manage.py build_recommendations
+
+By default only carts paid since the previous run are counted; schedule it
+periodically (e.g. hourly from cron). Use --full to recount every paid cart.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from products import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Counts product co-occurrence in paid carts and stores the top-K neighbours per product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recount all paid carts from scratch')
+        parser.add_argument('--passes', type=int, default=1,
+                            help='Split a full build into this many passes to bound memory')
+        parser.add_argument('--top-k', type=int, default=recommendations.TOP_K)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        carts, products = recommendations.build(
+            full=options['full'], passes=max(1, options['passes']), k=options['top_k'],
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Counted {carts} paid carts, updated recommendations for {products} products in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,73 @@
+"""
+Management command to move existing catalog images into content-addressed storage
+Run: python manage.py dedupe_images
+
+Every ProductImage and Category image not yet stored as a blob is hashed and
+re-pointed at `blobs/<digest>`, so identical files collapse into one. With
+--delete-originals the old files and their renditions are removed afterwards.
+"""
+
+from django.core.management.base import BaseCommand
+from base.storage import blob_name, content_digest, is_blob_name
+from products.models import Category, ProductImage
+from products.renditions import FORMATS, RENDITIONS, rendition_name
+
+
+class Command(BaseCommand):
+    help = 'Deduplicates product and category images into content-addressed blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-originals', action='store_true',
+                            help='Remove the old files and their renditions once no row uses them')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.moved = 0
+        self.blobs = set()
+        self.originals = set()
+
+        self.dedupe(ProductImage.objects.all(), 'image')
+        self.dedupe(Category.objects.all(), 'category_image')
+
+        deleted = freed = 0
+        if options['delete_originals'] and not self.dry_run:
+            storage = ProductImage._meta.get_field('image').storage
+            for name in sorted(self.originals):
+                for candidate in [name] + self.rendition_names(name):
+                    if storage.exists(candidate):
+                        freed += storage.size(candidate)
+                        storage.delete(candidate)
+                        deleted += 1
+
+        prefix = 'Would move' if self.dry_run else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} {self.moved} images into {len(self.blobs)} blobs ({self.moved - len(self.blobs)} duplicates)'
+        ))
+        if deleted:
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} original files, freeing {freed / 1024 / 1024:.1f} MB'))
+
+    def dedupe(self, queryset, field_name):
+        storage = queryset.model._meta.get_field(field_name).storage
+        for obj in queryset.iterator(chunk_size=500):
+            field_file = getattr(obj, field_name)
+            if not field_file or is_blob_name(field_file.name):
+                continue
+            if not storage.exists(field_file.name):
+                self.stdout.write(self.style.WARNING(f'Missing file for {obj}: {field_file.name}'))
+                continue
+            old_name = field_file.name
+            self.moved += 1
+            self.originals.add(old_name)
+            with storage.open(old_name, 'rb') as content:
+                if self.dry_run:
+                    self.blobs.add(blob_name(content_digest(content), old_name))
+                    continue
+                new_name = storage.save(old_name, content)
+            self.blobs.add(new_name)
+            field_file.name = new_name
+            # save() runs the usual signals: renditions for new blobs, cache invalidation
+            obj.save(update_fields=[field_name])
+
+    def rendition_names(self, name):
+        return [rendition_name(name, rendition, ext) for rendition in RENDITIONS for ext in FORMATS]
@@ -0,0 +1,60 @@
+"""
+Management command to backfill resized renditions for existing catalog images
+Run: python manage.py generate_renditions [--workers 8] [--force]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from products.models import Category, ProductImage
+from products.renditions import generate_renditions
+
+
+class Command(BaseCommand):
+    help = 'Generates thumb/card/detail WebP and JPEG renditions for product and category images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                            help='Number of images processed in parallel')
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate renditions that already exist')
+
+    def handle(self, *args, **options):
+        force = options['force']
+        files = [
+            image.image
+            for image in ProductImage.objects.only('image').iterator(chunk_size=2000)
+            if image.image
+        ]
+        files += [
+            category.category_image
+            for category in Category.objects.only('category_image').iterator(chunk_size=2000)
+            if category.category_image
+        ]
+        # The same blob can back several rows; render each file once
+        unique_files = list({field_file.name: field_file for field_file in files}.values())
+
+        self.stdout.write(f'Processing {len(unique_files)} images with {options["workers"]} workers...')
+        started = time.monotonic()
+        written = failed = 0
+
+        def render(field_file):
+            try:
+                return generate_renditions(field_file, force=force)
+            except Exception as e:
+                self.stderr.write(f'{field_file.name}: {e}')
+                return None
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for result in executor.map(render, unique_files):
+                if result is None:
+                    failed += 1
+                else:
+                    written += result
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} renditions for {len(unique_files)} images in {elapsed:.1f}s ({failed} failed)'
+        ))
@@ -0,0 +1,209 @@
+"""
+Management command to bulk import a product catalog from a CSV or JSONL feed
+Run: python manage.py import_catalog catalog.csv
+
+Each row/object needs `product_name`, `category` and `price`, and may carry
+`description`, `sizes` and `colors` (names separated by `|`). Products are
+matched on their slug, so re-importing a feed updates rows in place and the
+variants listed in the feed replace the product's current ones.
+"""
+
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+from cart.models import Cart
+from products.catalog import bump_catalog_version
+from products.models import Category, ColorVariant, Product, ProductSKU, SizeVariant
+from products import search
+
+
+def read_rows(path, fmt, on_bad_line):
+    """Feed rows as dicts; JSONL lines that don't parse go to `on_bad_line(number, error)`."""
+    with open(path, newline='', encoding='utf-8') as feed:
+        if fmt == 'csv':
+            yield from csv.DictReader(feed)
+        else:
+            for number, line in enumerate(feed, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as error:
+                    on_bad_line(number, error)
+
+
+def split_names(value):
+    """Variant names from a `|`-separated string or a list of strings; TypeError otherwise."""
+    if isinstance(value, list):
+        names = value
+    else:
+        names = (value or '').split('|')
+    if not all(isinstance(name, str) for name in names):
+        raise TypeError('Variant names must be strings')
+    return list(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+class Command(BaseCommand):
+    help = 'Streams a CSV/JSONL catalog feed into the database with batched bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'No such file: {path}')
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        batch_size = options['batch_size']
+
+        # Categories and variants are few; keep them in memory for the whole run
+        self.categories = {category.slug: category for category in Category.objects.all()}
+        self.sizes = {}
+        for variant in SizeVariant.objects.order_by('create_at'):
+            self.sizes.setdefault(variant.size, variant)
+        self.colors = {}
+        for variant in ColorVariant.objects.order_by('create_at'):
+            self.colors.setdefault(variant.color_name, variant)
+
+        started = time.monotonic()
+        imported = skipped = 0
+        bad_lines = []
+
+        def bad_line(number, error):
+            bad_lines.append(number)
+            self.stdout.write(self.style.WARNING(f'Line {number}: invalid JSON ({error.msg})'))
+
+        batch = []
+        for row in read_rows(path, fmt, bad_line):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                done, bad = self.import_batch(batch)
+                imported += done
+                skipped += bad
+                batch = []
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'{imported} products ({imported / elapsed:.0f}/s)')
+        if batch:
+            done, bad = self.import_batch(batch)
+            imported += done
+            skipped += bad
+        skipped += len(bad_lines)
+        bump_catalog_version()
+
+        elapsed = time.monotonic() - started
+        rate = imported / elapsed if elapsed else imported
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} products in {elapsed:.1f}s ({rate:.0f} products/s)'
+        ))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {skipped} invalid rows'))
+
+    def import_batch(self, rows):
+        """Upsert one batch of feed rows; returns (imported, skipped)."""
+        parsed = {}
+        skipped = 0
+        for row in rows:
+            try:
+                name = row['product_name'].strip()
+                category_name = row['category'].strip()
+                price = int(float(row['price']))
+                sizes = split_names(row.get('sizes'))
+                colors = split_names(row.get('colors'))
+            except (KeyError, AttributeError, TypeError, ValueError):
+                skipped += 1
+                continue
+            slug = slugify(name)
+            if not slug or not slugify(category_name):
+                skipped += 1
+                continue
+            # A product repeated within the batch: the last row wins
+            parsed[slug] = {
+                'name': name,
+                'category': category_name,
+                'price': price,
+                'description': row.get('description') or '',
+                'sizes': sizes,
+                'colors': colors,
+            }
+        if not parsed:
+            return 0, skipped
+
+        with transaction.atomic():
+            self.create_missing(parsed.values())
+            products = [
+                Product(
+                    product_name=data['name'],
+                    slug=slug,
+                    category=self.categories[slugify(data['category'])],
+                    price=data['price'],
+                    product_description=data['description'],
+                )
+                for slug, data in parsed.items()
+            ]
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=['slug'],
+                update_fields=['product_name', 'category', 'price', 'product_description', 'updated_at'],
+            )
+            # Rows that already existed keep their uid; read the real ones back
+            uids = dict(Product.objects.filter(slug__in=parsed).values_list('slug', 'uid'))
+            for product in products:
+                product.uid = uids[product.slug]
+
+            size_through = Product.size_variant.through
+            color_through = Product.color_variant.through
+            size_through.objects.filter(product__in=products).delete()
+            color_through.objects.filter(product__in=products).delete()
+            size_through.objects.bulk_create([
+                size_through(product_id=product.uid, sizevariant_id=self.sizes[size].uid)
+                for product in products for size in parsed[product.slug]['sizes']
+            ], batch_size=5000)
+            color_through.objects.bulk_create([
+                color_through(product_id=product.uid, colorvariant_id=self.colors[color].uid)
+                for product in products for color in parsed[product.slug]['colors']
+            ], batch_size=5000)
+
+            # bulk_create skips the save signals; maintain SKUs and the search index here
+            ProductSKU.objects.rebuild(products, variants={
+                product.pk: (
+                    [self.sizes[size] for size in parsed[product.slug]['sizes']],
+                    [self.colors[color] for color in parsed[product.slug]['colors']],
+                )
+                for product in products
+            })
+            search.index_products(products)
+            # Prices may have changed under open carts
+            Cart.objects.filter(
+                is_paid=False, pk__in=Cart.objects.filter(cart_items__product__in=products).values('pk'),
+            ).recompute_totals()
+        return len(products), skipped
+
+    def create_missing(self, parsed):
+        categories, sizes, colors = {}, {}, {}
+        for data in parsed:
+            slug = slugify(data['category'])
+            if slug not in self.categories:
+                categories.setdefault(slug, Category(category_name=data['category'], slug=slug))
+            for size in data['sizes']:
+                if size not in self.sizes:
+                    sizes.setdefault(size, SizeVariant(size=size))
+            for color in data['colors']:
+                if color not in self.colors:
+                    colors.setdefault(color, ColorVariant(color_name=color))
+        if categories:
+            Category.objects.bulk_create(categories.values())
+            self.categories.update(categories)
+        if sizes:
+            SizeVariant.objects.bulk_create(sizes.values())
+            self.sizes.update(sizes)
+        if colors:
+            ColorVariant.objects.bulk_create(colors.values())
+            self.colors.update(colors)
@@ -1,18 +1,55 @@
 """
 Management command to populate the database with sample data
 Run: python manage.py populate_db
+
+Scale mode generates a synthetic dataset on top of the sample catalog, e.g.
+Run: python manage.py populate_db --products 1000000 --users 100000 --carts 2000000 --payments 500000 --seed 42
 """
 
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
-from products.models import Category, Product, SizeVariant, ColorVariant, ProductImage
-from cart.models import Coupon
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from products.catalog import bump_catalog_version
+from products.popularity import WINDOW_DAYS
+from products.models import Category, Product, ProductSKU, SizeVariant, ColorVariant, ProductImage
+from products import search
+from accounts.models import Profile
+from base.models import uuid7
+from cart.models import Cart, CartItems, Coupon, Payment, line_key
+from datetime import timedelta
 import random
+import time
+
+ADJECTIVES = ['Classic', 'Premium', 'Compact', 'Wireless', 'Organic', 'Vintage', 'Smart', 'Deluxe',
+              'Slim', 'Rugged', 'Eco', 'Ultra', 'Portable', 'Handmade', 'Essential', 'Pro']
+NOUNS = ['Shirt', 'Jacket', 'Speaker', 'Lamp', 'Backpack', 'Watch', 'Bottle', 'Chair', 'Notebook',
+         'Sneakers', 'Headphones', 'Mug', 'Blanket', 'Charger', 'Wallet', 'Kettle']
+
+# Upper bound on the SKUs kept in memory to fill carts from
+SKU_POOL_SIZE = 200000
 
 
 class Command(BaseCommand):
-    help = 'Populates the database with sample data (excluding images)'
+    help = 'Populates the database with sample data (excluding images), or a large synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=0, help='Synthetic products to generate')
+        parser.add_argument('--users', type=int, default=0, help='Synthetic users to generate')
+        parser.add_argument('--carts', type=int, default=0, help='Synthetic carts to generate')
+        parser.add_argument('--payments', type=int, default=0, help='How many of the new carts are paid')
+        parser.add_argument('--items-per-cart', type=int, default=5, help='Average cart items per cart')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for a reproducible dataset')
+        parser.add_argument('--batch-size', type=int, default=5000)
 
     def handle(self, *args, **options):
+        self.populate_sample()
+        if any(options[name] for name in ('products', 'users', 'carts')):
+            self.populate_scale(options)
+
+    def populate_sample(self):
         self.stdout.write(self.style.SUCCESS('Starting database population...'))
         
         # Create Categories
@@ -196,3 +233,174 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f'Created {len(coupons_data)} coupons'))
         self.stdout.write(self.style.WARNING('\nNote: Images need to be added manually through admin panel or by uploading files.'))
 
+    def populate_scale(self, options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+
+        sku_pool = []
+        if options['products']:
+            sku_pool = self.generate_products(options['products'])
+        user_ids = []
+        if options['users']:
+            user_ids = self.generate_users(options['users'])
+        if options['carts']:
+            if not user_ids:
+                user_ids = list(User.objects.values_list('id', flat=True))
+            if not sku_pool:
+                sku_pool = list(
+                    ProductSKU.objects.values_list('product_id', 'size_variant_id', 'color_variant_id', 'price')
+                    [:SKU_POOL_SIZE]
+                )
+            if not sku_pool:
+                self.stdout.write(self.style.ERROR('No products to fill carts with; pass --products as well.'))
+                return
+            self.generate_carts(options['carts'], min(options['payments'], options['carts']),
+                                options['items_per_cart'], user_ids, sku_pool)
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Scale data generated in {time.monotonic() - started:.1f}s'))
+
+    def uuid7(self):
+        # Time-ordered like real rows; the random part comes from the seeded generator
+        return uuid7(random_bits=self.rng.getrandbits(80))
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def report(self, label, done, total, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'{label}: {done}/{total} ({done / elapsed if elapsed else done:.0f}/s)')
+
+    def generate_products(self, total):
+        """Bulk create products with variants, SKUs and search rows; returns a sample of SKUs."""
+        rng = self.rng
+        categories = list(Category.objects.all())
+        sizes = list(SizeVariant.objects.all())
+        colors = list(ColorVariant.objects.all())
+        size_through = Product.size_variant.through
+        color_through = Product.color_variant.through
+        # Numbering continues after existing products so slugs stay unique across runs
+        offset = Product.objects.count()
+        sku_pool = []
+        started = time.monotonic()
+
+        for start, count in self.batches(total):
+            products = []
+            variants = {}
+            for i in range(offset + start, offset + start + count):
+                name = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}'
+                product = Product(
+                    uid=self.uuid7(),
+                    product_name=name,
+                    slug=slugify(name),
+                    category=rng.choice(categories),
+                    price=int(rng.lognormvariate(7, 1)) + 99,
+                    product_description=f'{name} from the synthetic catalog.',
+                )
+                products.append(product)
+                variants[product.pk] = (
+                    rng.sample(sizes, rng.randint(0, min(4, len(sizes)))),
+                    rng.sample(colors, rng.randint(1, min(5, len(colors)))) if colors else [],
+                )
+            with transaction.atomic():
+                Product.objects.bulk_create(products)
+                size_through.objects.bulk_create([
+                    size_through(product_id=product.pk, sizevariant_id=size.pk)
+                    for product in products for size in variants[product.pk][0]
+                ])
+                color_through.objects.bulk_create([
+                    color_through(product_id=product.pk, colorvariant_id=color.pk)
+                    for product in products for color in variants[product.pk][1]
+                ])
+                # bulk_create skips the save signals that maintain these
+                ProductSKU.objects.rebuild(products, variants=variants)
+                search.index_products(products)
+
+            for product in products:
+                if len(sku_pool) >= SKU_POOL_SIZE:
+                    break
+                size = variants[product.pk][0][0] if variants[product.pk][0] else None
+                color = variants[product.pk][1][0] if variants[product.pk][1] else None
+                sku_pool.append((
+                    product.pk, size.pk if size else None, color.pk if color else None,
+                    product.price + (size.price if size else 0) + (color.price if color else 0),
+                ))
+            self.report('Products', start + count, total, started)
+        return sku_pool
+
+    def generate_users(self, total):
+        """Bulk create verified users with profiles; returns their ids."""
+        password = make_password('password123')
+        offset = User.objects.count()
+        user_ids = []
+        started = time.monotonic()
+
+        for start, count in self.batches(total):
+            users = [
+                User(username=f'user{i}', email=f'user{i}@example.com', password=password)
+                for i in range(offset + start, offset + start + count)
+            ]
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                # The post_save signal that creates profiles does not fire for bulk_create
+                Profile.objects.bulk_create([
+                    Profile(uid=self.uuid7(), user_id=user.pk, is_email_verified=True) for user in users
+                ])
+            user_ids += [user.pk for user in users]
+            self.report('Users', start + count, total, started)
+        return user_ids
+
+    def generate_carts(self, total, paid, items_per_cart, user_ids, sku_pool):
+        """Bulk create carts with items; the first `paid` carts get a successful payment."""
+        rng = self.rng
+        max_items = max(1, 2 * items_per_cart - 1)
+        created_items = 0
+        started = time.monotonic()
+
+        # A user has at most one open cart; later open carts drawn for them stay anonymous
+        open_cart_users = set(Cart.objects.filter(is_paid=False, user__isnull=False).values_list('user_id', flat=True))
+
+        for start, count in self.batches(total):
+            carts, items, payments = [], [], []
+            now = timezone.now()
+            for i in range(start, start + count):
+                is_paid = i < paid
+                user_id = rng.choice(user_ids) if user_ids and (is_paid or rng.random() < 0.8) else None
+                if not is_paid and user_id is not None:
+                    if user_id in open_cart_users:
+                        user_id = None
+                    else:
+                        open_cart_users.add(user_id)
+                cart = Cart(uid=self.uuid7(), user_id=user_id, is_paid=is_paid)
+                carts.append(cart)
+                amount = 0
+                lines = rng.sample(sku_pool, min(rng.randint(1, max_items), len(sku_pool)))
+                for product_id, size_id, color_id, price in lines:
+                    quantity = rng.randint(1, 3)
+                    items.append(CartItems(
+                        uid=self.uuid7(), cart_id=cart.pk, product_id=product_id,
+                        size_variant_id=size_id, color_variant_id=color_id, quantity=quantity,
+                        line_key=line_key(product_id, size_id, color_id),
+                    ))
+                    amount += price * quantity
+                cart.item_count = len(lines)
+                cart.subtotal = amount
+                if is_paid:
+                    payments.append(Payment(
+                        uid=self.uuid7(),
+                        cart_id=cart.pk,
+                        razorpay_order_id=f'order_{cart.pk.hex}',
+                        razorpay_payment_id=f'pay_{cart.pk.hex[:14]}',
+                        amount=amount * 100,
+                        status='Success',
+                        # Spread over the popularity window so decay and incremental builds have history
+                        paid_at=now - timedelta(seconds=rng.uniform(0, WINDOW_DAYS * 24 * 60 * 60)),
+                    ))
+            with transaction.atomic():
+                Cart.objects.bulk_create(carts)
+                CartItems.objects.bulk_create(items)
+                Payment.objects.bulk_create(payments)
+            created_items += len(items)
+            self.report('Carts', start + count, total, started)
+        self.stdout.write(self.style.SUCCESS(f'Created {total} carts with {created_items} items, {paid} paid'))
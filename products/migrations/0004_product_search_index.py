@@ -0,0 +1,36 @@
+from django.db import migrations
+
+from products import search
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    search.create_index(schema_editor)
+    Product = apps.get_model('products', 'Product')
+    rows = [
+        (search.fts_rowid(uid), uid.hex, name, description)
+        for uid, name, description in Product.objects.values_list('uid', 'product_name', 'product_description')
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {search.FTS_TABLE} (rowid, uid, product_name, product_description) VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    search.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0003_productimage_color_variant_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_product_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "create_at", "uid"],
+                name="product_category_newest_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "price", "uid"], name="product_category_price_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:19
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+def materialize_skus(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    ProductSKU = apps.get_model("products", "ProductSKU")
+    rows = []
+    for product in Product.objects.prefetch_related("size_variant", "color_variant"):
+        sizes = [None] + list(
+            {v.size: v for v in reversed(list(product.size_variant.all()))}.values()
+        )
+        colors = [None] + list(
+            {
+                v.color_name: v for v in reversed(list(product.color_variant.all()))
+            }.values()
+        )
+        for size in sizes:
+            for color in colors:
+                size_price = size.price if size else 0
+                color_price = color.price if color else 0
+                rows.append(
+                    ProductSKU(
+                        product=product,
+                        size_variant=size,
+                        color_variant=color,
+                        size=size.size if size else "",
+                        color=color.color_name if color else "",
+                        base_price=product.price,
+                        size_price=size_price,
+                        color_price=color_price,
+                        price=product.price + size_price + color_price,
+                    )
+                )
+    ProductSKU.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0005_product_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSKU",
+            fields=[
+                (
+                    "uid",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("create_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("size", models.CharField(blank=True, default="", max_length=100)),
+                ("color", models.CharField(blank=True, default="", max_length=100)),
+                ("base_price", models.IntegerField(default=0)),
+                ("size_price", models.IntegerField(default=0)),
+                ("color_price", models.IntegerField(default=0)),
+                ("price", models.IntegerField(default=0)),
+                (
+                    "color_variant",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="products.colorvariant",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="skus",
+                        to="products.product",
+                    ),
+                ),
+                (
+                    "size_variant",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="products.sizevariant",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("product", "size", "color"), name="unique_product_sku"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(materialize_skus, migrations.RunPython.noop),
+    ]
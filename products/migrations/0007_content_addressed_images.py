@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:33
+
+import base.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0006_productsku"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="category",
+            name="category_image",
+            field=models.ImageField(
+                storage=base.storage.content_addressed_storage, upload_to="categories"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="productimage",
+            name="image",
+            field=models.ImageField(
+                storage=base.storage.content_addressed_storage, upload_to="product"
+            ),
+        ),
+    ]
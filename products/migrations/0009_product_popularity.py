@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0008_product_recommendations"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="popularity",
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "popularity", "uid"],
+                name="product_category_popular_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["popularity", "uid"], name="product_popularity_idx"
+            ),
+        ),
+    ]
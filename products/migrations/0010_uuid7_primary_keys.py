@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:38
+
+import base.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0009_product_popularity"),
+    ]
+
+    # The key default is generated in Python, so the schema is unchanged; only
+    # the migration state changes and no table has to be rebuilt.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="category",
+                    name="uid",
+                    field=models.UUIDField(
+                        default=base.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="colorvariant",
+                    name="uid",
+                    field=models.UUIDField(
+                        default=base.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="product",
+                    name="uid",
+                    field=models.UUIDField(
+                        default=base.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="productimage",
+                    name="uid",
+                    field=models.UUIDField(
+                        default=base.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="productsku",
+                    name="uid",
+                    field=models.UUIDField(
+                        default=base.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="sizevariant",
+                    name="uid",
+                    field=models.UUIDField(
+                        default=base.models.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -1,12 +1,24 @@
+import logging
+
 from django.db import models
+from django.db.models import F, Prefetch
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
+from django.dispatch import receiver
 from base.models import BaseModel
+from base.storage import content_addressed_storage
 from django.utils.text import slugify
+from django.utils import timezone
+from .renditions import RENDITION_ERRORS, generate_renditions
+from . import search
+from .catalog import bump_catalog_version
+
+logger = logging.getLogger(__name__)
 
 
 class Category(BaseModel):
     category_name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True, null=True, blank=True)
-    category_image = models.ImageField(upload_to="categories")
+    category_image = models.ImageField(upload_to="categories", storage=content_addressed_storage)
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.category_name)
@@ -29,6 +41,17 @@ class SizeVariant(BaseModel):
     def __str__(self) -> str:
         return self.size
 
+class ProductQuerySet(models.QuerySet):
+
+    def for_listing(self):
+        """Products ready for card grids: category joined in and only the
+        primary image prefetched, so a page costs the same queries at any size."""
+        primary_images = ProductImage.objects.order_by('create_at')[:1]
+        return self.select_related('category').prefetch_related(
+            Prefetch('product_images', queryset=primary_images, to_attr='primary_images')
+        )
+
+
 class Product(BaseModel):
     product_name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True, null=True, blank=True)
@@ -37,6 +60,20 @@ class Product(BaseModel):
     product_description = models.TextField()    
     color_variant = models.ManyToManyField(ColorVariant, blank= True)
     size_variant = models.ManyToManyField(SizeVariant, blank= True)
+    # Time-decayed quantity sold, maintained by `python manage.py refresh_popularity`
+    popularity = models.FloatField(default=0, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of category listings for each sort order
+            models.Index(fields=['category', 'create_at', 'uid'], name='product_category_newest_idx'),
+            models.Index(fields=['category', 'price', 'uid'], name='product_category_price_idx'),
+            models.Index(fields=['category', 'popularity', 'uid'], name='product_category_popular_idx'),
+            # Homepage top-N
+            models.Index(fields=['popularity', 'uid'], name='product_popularity_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.product_name)
@@ -44,18 +81,318 @@ class Product(BaseModel):
 
     def __str__(self) -> str:
         return self.product_name
+
+    @property
+    def primary_image(self):
+        """First uploaded image; served from the prefetch when `for_listing` was used."""
+        if hasattr(self, 'primary_images'):
+            return self.primary_images[0] if self.primary_images else None
+        return self.product_images.order_by('create_at').first()
     
+    def get_sku(self, size='', color=''):
+        """The product's SKU for a size/color combination; blank means none selected."""
+        return self.skus.get(size=size or '', color=color or '')
+
     def get_product_price_by_size(self, size):
-        return self.price + SizeVariant.objects.get(size = size).price
+        return self.get_sku(size=size).price
     
     def get_product_price_by_color(self, color_name):
-        return self.price + ColorVariant.objects.get(color_name = color_name).price
+        return self.get_sku(color=color_name).price
+
+
+
+
+def _first_by_name(variants, attr):
+    by_name = {}
+    for variant in variants:
+        by_name.setdefault(getattr(variant, attr), variant)
+    return list(by_name.values())
+
+
+class ProductSKUManager(models.Manager):
+
+    def rebuild(self, products, variants=None):
+        """Re-materialize the SKUs of `products` from their current variants.
+
+        Every combination of (sizes + no size) x (colors + no color) gets a row
+        with its effective price; variants sharing a name keep the first one.
+        Callers that already hold the variants can pass `variants`, a dict of
+        product pk -> (sizes, colors), to skip reading them back.
+        """
+        if variants is None:
+            products = list(
+                Product.objects.filter(pk__in=[product.pk for product in products])
+                .prefetch_related('size_variant', 'color_variant')
+            )
+            variants = {
+                product.pk: (product.size_variant.all(), product.color_variant.all())
+                for product in products
+            }
+        rows = []
+        for product in products:
+            product_sizes, product_colors = variants[product.pk]
+            sizes = [None] + _first_by_name(product_sizes, 'size')
+            colors = [None] + _first_by_name(product_colors, 'color_name')
+            for size in sizes:
+                for color in colors:
+                    size_price = size.price if size else 0
+                    color_price = color.price if color else 0
+                    rows.append(self.model(
+                        product=product,
+                        size_variant=size,
+                        color_variant=color,
+                        size=size.size if size else '',
+                        color=color.color_name if color else '',
+                        base_price=product.price,
+                        size_price=size_price,
+                        color_price=color_price,
+                        price=product.price + size_price + color_price,
+                    ))
+        self.filter(product__in=products).delete()
+        self.bulk_create(rows, batch_size=1000)
+
 
+class ProductSKU(BaseModel):
+    """A purchasable size/color combination of a product with its precomputed price."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="skus")
+    size_variant = models.ForeignKey(SizeVariant, on_delete=models.CASCADE, null=True, blank=True)
+    color_variant = models.ForeignKey(ColorVariant, on_delete=models.CASCADE, null=True, blank=True)
+    size = models.CharField(max_length=100, blank=True, default='')
+    color = models.CharField(max_length=100, blank=True, default='')
+    base_price = models.IntegerField(default=0)
+    size_price = models.IntegerField(default=0)
+    color_price = models.IntegerField(default=0)
+    price = models.IntegerField(default=0)
+
+    objects = ProductSKUManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'size', 'color'], name='unique_product_sku'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.product} ({self.size or '-'}/{self.color or '-'})"
+
+
+class ProductPairCount(models.Model):
+    """How many paid carts contained both products; the sparse co-occurrence matrix.
+
+    Rows are stored in both directions and, like ProductRecommendation, skip
+    BaseModel's uuid key and timestamps to stay compact.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='unique_product_pair'),
+        ]
 
 
+class ProductRecommendation(models.Model):
+    """One of a product's top-K "frequently bought together" products."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="recommendations")
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="recommended_for")
+    rank = models.PositiveSmallIntegerField()
+    score = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_recommendation_rank'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.product} -> {self.recommended} (#{self.rank})"
+
+
+class RecommendationRun(models.Model):
+    """A completed recommendations build; the latest one is the watermark for incremental runs."""
+    finished_at = models.DateTimeField(auto_now_add=True)
+    full = models.BooleanField(default=False)
+    carts_counted = models.IntegerField(default=0)
+    # (paid_at, uid) of the last successful payment counted
+    last_paid_at = models.DateTimeField(null=True, blank=True)
+    last_payment_uid = models.UUIDField(null=True, blank=True)
+
 
 class ProductImage(BaseModel):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="product_images")
-    image = models.ImageField(upload_to="product")
+    image = models.ImageField(upload_to="product", storage=content_addressed_storage)
     color_variant = models.ForeignKey(ColorVariant, on_delete=models.SET_NULL, null=True, blank=True, related_name="product_images")
-    
\ No newline at end of file
+    
+
+@receiver(post_save, sender=ProductImage)
+def create_product_image_renditions(sender, instance, **kwargs):
+    try:
+        generate_renditions(instance.image)
+    except RENDITION_ERRORS:
+        # The upload is kept and served as is; generate_renditions can retry later
+        logger.exception('Could not generate renditions of %s', instance.image.name)
+
+
+@receiver(post_save, sender=Category)
+def create_category_image_renditions(sender, instance, **kwargs):
+    try:
+        generate_renditions(instance.category_image)
+    except RENDITION_ERRORS:
+        logger.exception('Could not generate renditions of %s', instance.category_image.name)
+
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, **kwargs):
+    search.index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_search_index(sender, instance, **kwargs):
+    search.remove_products([instance.uid])
+
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=SizeVariant)
+@receiver(post_delete, sender=SizeVariant)
+@receiver(post_save, sender=ColorVariant)
+@receiver(post_delete, sender=ColorVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(m2m_changed, sender=Product.size_variant.through)
+@receiver(m2m_changed, sender=Product.color_variant.through)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+
+@receiver(post_save, sender=Product)
+def update_product_sku_prices(sender, instance, created, **kwargs):
+    if created:
+        ProductSKU.objects.rebuild([instance])
+    else:
+        instance.skus.exclude(base_price=instance.price).update(
+            base_price=instance.price,
+            price=instance.price + F('size_price') + F('color_price'),
+        )
+
+
+# Variant model -> (its Product relation and ProductSKU foreign key, its name field)
+VARIANT_FIELDS = {
+    SizeVariant: ('size_variant', 'size'),
+    ColorVariant: ('color_variant', 'color_name'),
+}
+
+
+def _rebuild_shared_name_skus(variant):
+    """Rebuild the SKUs of products on which `variant` shares its new or old name
+    with another variant; returns their pks.
+
+    Only the first variant of a name gets SKUs, so on those products the rows
+    can't simply be renamed or repriced in place.
+    """
+    relation, name_field = VARIANT_FIELDS[type(variant)]
+    names = {getattr(variant, name_field), getattr(variant, '_stored_name', None)} - {None}
+    others = type(variant).objects.filter(**{f'{name_field}__in': names}).exclude(pk=variant.pk)
+    products = list(Product.objects.filter(**{relation: variant}).filter(**{f'{relation}__in': others}).distinct())
+    if products:
+        ProductSKU.objects.rebuild(products)
+    return [product.pk for product in products]
+
+
+@receiver(pre_save, sender=SizeVariant)
+@receiver(pre_save, sender=ColorVariant)
+def remember_variant_name(sender, instance, **kwargs):
+    _relation, name_field = VARIANT_FIELDS[sender]
+    instance._stored_name = sender.objects.filter(pk=instance.pk).values_list(name_field, flat=True).first()
+
+
+@receiver(post_save, sender=SizeVariant)
+def update_size_variant_skus(sender, instance, **kwargs):
+    rebuilt = _rebuild_shared_name_skus(instance)
+    ProductSKU.objects.filter(size_variant=instance).exclude(product__in=rebuilt).update(
+        size=instance.size,
+        size_price=instance.price,
+        price=F('base_price') + instance.price + F('color_price'),
+    )
+
+
+@receiver(post_save, sender=ColorVariant)
+def update_color_variant_skus(sender, instance, **kwargs):
+    rebuilt = _rebuild_shared_name_skus(instance)
+    ProductSKU.objects.filter(color_variant=instance).exclude(product__in=rebuilt).update(
+        color=instance.color_name,
+        color_price=instance.price,
+        price=F('base_price') + F('size_price') + instance.price,
+    )
+
+
+@receiver(m2m_changed, sender=Product.size_variant.through)
+@receiver(m2m_changed, sender=Product.color_variant.through)
+def rebuild_product_skus(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # Clearing from the variant side: post_clear no longer knows which products it had
+        instance._cleared_product_ids = list(instance.product_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        ProductSKU.objects.rebuild([instance])
+    elif action == 'post_clear':
+        # Rebuilt rather than deleted, so another variant of the same name takes over
+        product_ids = getattr(instance, '_cleared_product_ids', None)
+        if product_ids:
+            ProductSKU.objects.rebuild(Product.objects.filter(pk__in=product_ids))
+    elif pk_set:
+        ProductSKU.objects.rebuild(Product.objects.filter(pk__in=pk_set))
+
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def touch_product_for_image(sender, instance, **kwargs):
+    # Moves the product's updated_at so its cached page fragments are re-rendered
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Product.size_variant.through)
+@receiver(m2m_changed, sender=Product.color_variant.through)
+def touch_product_for_variants(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # Clearing from the variant side: touch the products before the links go
+        instance.product_set.update(updated_at=timezone.now())
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            Product.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+        elif pk_set:
+            Product.objects.filter(pk__in=pk_set).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=SizeVariant)
+@receiver(pre_delete, sender=ColorVariant)
+def remember_products_for_variant(sender, instance, **kwargs):
+    # The links go with the variant and m2m_changed doesn't fire for them
+    instance._product_ids = list(instance.product_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=SizeVariant)
+@receiver(post_delete, sender=ColorVariant)
+def touch_products_for_deleted_variant(sender, instance, **kwargs):
+    # A deleted variant leaves variants_version alone; updated_at re-renders the fragments
+    if getattr(instance, '_product_ids', None):
+        Product.objects.filter(pk__in=instance._product_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=SizeVariant)
+@receiver(post_delete, sender=ColorVariant)
+def rebuild_skus_for_deleted_variant(sender, instance, **kwargs):
+    # Its SKUs went with it; products with another variant of the same name fall back to that one
+    if getattr(instance, '_product_ids', None):
+        relation, name_field = VARIANT_FIELDS[sender]
+        products = Product.objects.filter(
+            pk__in=instance._product_ids, **{f'{relation}__{name_field}': getattr(instance, name_field)}
+        ).distinct()
+        ProductSKU.objects.rebuild(products)
@@ -0,0 +1,134 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by the sort-key values of the row they start after
+instead of an OFFSET, so the database seeks straight to the page through
+an index and page 1000 costs the same as page 1. Cursors are opaque
+URL-safe strings carrying the sort name, the boundary key and a direction.
+"""
+
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from functools import reduce
+import operator
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort, values, direction):
+    payload = json.dumps({'s': sort, 'v': [_encode_value(value) for value in values], 'd': direction},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (sort, values, direction); raises InvalidCursor on garbage."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        sort, values, direction = payload['s'], payload['v'], payload['d']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return sort, values, direction
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return value.hex
+    return value
+
+
+class KeysetPage:
+
+    def __init__(self, object_list, sort, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.sort = sort
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _key_values(obj, ordering):
+    return [getattr(obj, field.lstrip('-')) for field in ordering]
+
+
+def _seek_filter(ordering, values, forward):
+    """Q selecting rows strictly after `values` in `ordering` (or before, if not forward)."""
+    clauses = []
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        lookup = 'lt' if descending == forward else 'gt'
+        equal = {prior.lstrip('-'): values[j] for j, prior in enumerate(ordering[:i])}
+        clauses.append(Q(**equal, **{f'{name}__{lookup}': values[i]}))
+    # The redundant inclusive bound on the leading key lets the database seek
+    # into the index instead of scanning it from the start
+    leading = ordering[0]
+    leading_lookup = 'lte' if leading.startswith('-') == forward else 'gte'
+    return Q(**{f'{leading.lstrip("-")}__{leading_lookup}': values[0]}) & reduce(operator.or_, clauses)
+
+
+def keyset_paginate(queryset, sort, ordering, cursor=None, page_size=24):
+    """Paginate `queryset` ordered by `ordering` (which must end in a unique field)."""
+    direction = 'next'
+    values = None
+    if cursor:
+        cursor_sort, raw_values, direction = decode_cursor(cursor)
+        if cursor_sort != sort or len(raw_values) != len(ordering):
+            raise InvalidCursor(cursor)
+        model_meta = queryset.model._meta
+        try:
+            values = [
+                model_meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, raw_values)
+            ]
+        except Exception:
+            raise InvalidCursor(cursor)
+
+    forward = direction == 'next'
+    if forward:
+        page_ordering = list(ordering)
+    else:
+        page_ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+    page_qs = queryset.order_by(*page_ordering)
+    if values is not None:
+        page_qs = page_qs.filter(_seek_filter(ordering, values, forward))
+    rows = list(page_qs[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not forward:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if (has_more if forward else values is not None):
+            next_cursor = encode_cursor(sort, _key_values(rows[-1], ordering), 'next')
+        if (values is not None if forward else has_more):
+            prev_cursor = encode_cursor(sort, _key_values(rows[0], ordering), 'prev')
+    return KeysetPage(rows, sort, next_cursor, prev_cursor)
@@ -0,0 +1,126 @@
+"""
+"Frequently bought together" recommendations from paid cart co-occurrence.
+
+`build()` streams the items of paid carts in cart order, counts every pair
+of distinct products bought together into a sparse matrix (a dict keyed by
+product pair), merges it into ProductPairCount and rewrites the top-K rows
+of ProductRecommendation for every product whose counts changed.
+
+Full builds can split the matrix into several passes over the cart items,
+each keeping only the rows of a slice of products in memory. Incremental
+builds only count carts paid after the watermark left by the previous run:
+the (paid_at, uid) of the last successful payment counted. Both are written
+once, so a cart saved again after payment is never counted twice.
+"""
+
+from collections import defaultdict
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import Product, ProductPairCount, ProductRecommendation, RecommendationRun
+
+TOP_K = 8
+CHUNK_SIZE = 5000
+
+
+def _payment_range(after, upto):
+    """Q over successful payments with (paid_at, uid) in (after, upto]."""
+    q = Q(status='Success', paid_at__isnull=False) & (
+        Q(paid_at__lt=upto[0]) | Q(paid_at=upto[0], uid__lte=upto[1])
+    )
+    if after is not None:
+        q &= Q(paid_at__gt=after[0]) | Q(paid_at=after[0], uid__gt=after[1])
+    return q
+
+
+def count_pairs(carts, passes=1, current_pass=0):
+    """Sparse co-occurrence counts {product: {other: carts}} over the items of `carts`.
+
+    Only rows whose product falls in `current_pass` of `passes` slices are kept.
+    """
+    from cart.models import CartItems
+
+    counts = defaultdict(lambda: defaultdict(int))
+    items = (
+        CartItems.objects.filter(cart__in=carts, product__isnull=False)
+        .order_by('cart_id')
+        .values_list('cart_id', 'product_id')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for _cart_id, rows in groupby(items, key=lambda row: row[0]):
+        products = {product_id for _cart, product_id in rows}
+        if len(products) < 2:
+            continue
+        for product in products:
+            if product.int % passes != current_pass:
+                continue
+            row = counts[product]
+            for other in products:
+                if other != product:
+                    row[other] += 1
+    return counts
+
+
+def _top_k(row, k):
+    return sorted(row.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+
+def _write(counts, merge, k):
+    """Store pair counts (added to the stored ones when `merge`) and the top-K of their products."""
+    products = list(counts)
+    for start in range(0, len(products), 500):
+        chunk = products[start:start + 500]
+        if merge:
+            stored = ProductPairCount.objects.filter(product__in=chunk).values_list('product_id', 'other_id', 'count')
+            for product, other, count in stored.iterator(chunk_size=CHUNK_SIZE):
+                counts[product][other] += count
+        ProductPairCount.objects.filter(product__in=chunk).delete()
+        ProductPairCount.objects.bulk_create([
+            ProductPairCount(product_id=product, other_id=other, count=count)
+            for product in chunk for other, count in counts[product].items()
+        ], batch_size=CHUNK_SIZE)
+        ProductRecommendation.objects.filter(product__in=chunk).delete()
+        ProductRecommendation.objects.bulk_create([
+            ProductRecommendation(product_id=product, recommended_id=other, rank=rank, score=count)
+            for product in chunk for rank, (other, count) in enumerate(_top_k(counts[product], k), 1)
+        ], batch_size=CHUNK_SIZE)
+        # Product pages are cached and served with validators keyed on updated_at
+        Product.objects.filter(pk__in=chunk).update(updated_at=timezone.now())
+    return len(products)
+
+
+def build(full=False, passes=1, k=TOP_K):
+    """Count new paid carts (all of them when `full`); returns (carts counted, products updated)."""
+    from cart.models import Cart, Payment
+
+    previous = None if full else RecommendationRun.objects.order_by('-finished_at').first()
+    after = None
+    if previous is not None and previous.last_paid_at is not None:
+        after = (previous.last_paid_at, previous.last_payment_uid)
+
+    # Fix the upper end now so carts paid while we run are left for the next run
+    paid = Payment.objects.filter(status='Success', paid_at__isnull=False)
+    last = paid.order_by('-paid_at', '-uid').values_list('paid_at', 'uid').first()
+    if last is None or (after is not None and last <= after):
+        return 0, 0
+    carts = Cart.objects.filter(pk__in=Payment.objects.filter(_payment_range(after, last)).values('cart_id'))
+    carts_counted = carts.count()
+
+    updated = 0
+    with transaction.atomic():
+        if full:
+            ProductPairCount.objects.all().delete()
+            ProductRecommendation.objects.all().delete()
+            for current_pass in range(passes):
+                updated += _write(count_pairs(carts, passes, current_pass), merge=False, k=k)
+        else:
+            updated = _write(count_pairs(carts), merge=True, k=k)
+        RecommendationRun.objects.create(
+            full=full, carts_counted=carts_counted, last_paid_at=last[0], last_payment_uid=last[1],
+        )
+        bump_catalog_version()
+    return carts_counted, updated
@@ -0,0 +1,122 @@
+"""
+Resized WebP/JPEG renditions of uploaded catalog images.
+
+Renditions are stored next to the original in the same storage, named
+`<stem>.<rendition>.<ext>` (e.g. `product/4.card.webp`), so their URLs can be
+derived from the original file name without any database lookups. Whether
+they exist yet is remembered in the cache (uploads are content-addressed, so
+a name never points at different bytes) and on the file object for the rest
+of the render, so pages don't stat the storage per image.
+"""
+
+import os
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+
+# Rendition name -> target width in pixels
+RENDITIONS = {
+    'thumb': 150,
+    'card': 300,
+    'detail': 800,
+}
+
+# What a broken upload or unreadable storage raises while rendering
+# (UnidentifiedImageError and truncated files are OSErrors)
+RENDITION_ERRORS = (OSError, Image.DecompressionBombError)
+
+# Seconds a "no renditions yet" answer is trusted for
+MISSING_TIMEOUT = 5 * 60
+
+# File extension -> (Pillow format, save options)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def rendition_name(name, rendition, ext):
+    """Storage name of a rendition of the original file `name`."""
+    stem, _ = os.path.splitext(name)
+    return f'{stem}.{rendition}.{ext}'
+
+
+def rendition_url(field_file, rendition, fallback=''):
+    """URL of a JPEG rendition, the original upload until renditions exist, or `fallback`."""
+    if not field_file:
+        return fallback
+    if not has_renditions(field_file):
+        return field_file.url
+    return field_file.storage.url(rendition_name(field_file.name, rendition, 'jpg'))
+
+
+def _renditions_key(name):
+    return f'renditions:{name}'
+
+
+def has_renditions(field_file):
+    """True when the renditions of `field_file` have already been generated."""
+    if not field_file:
+        return False
+    known = getattr(field_file, '_has_renditions', None)
+    if known is None:
+        key = _renditions_key(field_file.name)
+        known = cache.get(key)
+        if known is None:
+            known = field_file.storage.exists(rendition_name(field_file.name, 'detail', 'jpg'))
+            # generate_renditions() overwrites a miss as soon as it has written them
+            cache.set(key, known, timeout=None if known else MISSING_TIMEOUT)
+        field_file._has_renditions = known
+    return known
+
+
+def _flatten(image):
+    """`image` as opaque RGB over a white background, for formats without alpha."""
+    if image.mode in ('RGB', 'L'):
+        return image
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _encode(image, width, fmt, options):
+    if image.width > width:
+        height = round(image.height * width / image.width)
+        image = image.resize((width, height), Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def generate_renditions(field_file, force=False):
+    """Create every rendition of `field_file`; returns the number of files written."""
+    if not field_file or (not force and has_renditions(field_file)):
+        return 0
+
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    # WebP keeps transparency; JPEG gets the image flattened onto white
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    opaque = _flatten(image)
+
+    # Content-addressed storage would rename renditions after their digest
+    save = getattr(storage, 'save_derived', storage.save)
+    written = 0
+    for rendition, width in RENDITIONS.items():
+        for ext, (fmt, options) in FORMATS.items():
+            name = rendition_name(field_file.name, rendition, ext)
+            if storage.exists(name):
+                storage.delete(name)
+            save(name, ContentFile(_encode(image if fmt == 'WEBP' else opaque, width, fmt, options)))
+            written += 1
+    cache.set(_renditions_key(field_file.name), True, timeout=None)
+    field_file._has_renditions = True
+    return written
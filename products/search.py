@@ -0,0 +1,184 @@
+"""
+Full-text product search backed by an SQLite FTS5 virtual table.
+
+`products_product_fts` mirrors `Product.product_name` and
+`Product.product_description` and is kept in sync by the Product save/delete
+signals. Each row's rowid is derived from the product uid so updates and
+deletes are rowid lookups rather than scans. On databases without FTS5 the
+search falls back to `icontains` filtering.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .pagination import InvalidCursor, KeysetPage, decode_cursor, encode_cursor, keyset_paginate
+
+FTS_TABLE = 'products_product_fts'
+
+# bm25 column weights: a hit in the product name outranks one in the description
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def fts_rowid(uid):
+    """Stable 64-bit rowid for a product uid (its random low half)."""
+    return int.from_bytes(uid.bytes[8:], 'big', signed=True)
+
+
+def create_index(schema_editor=None):
+    cursor_owner = schema_editor.connection if schema_editor else connection
+    with cursor_owner.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "uid UNINDEXED, product_name, product_description, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+
+
+def drop_index(schema_editor=None):
+    cursor_owner = schema_editor.connection if schema_editor else connection
+    with cursor_owner.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def index_products(products):
+    """Insert or replace the index rows of `products`."""
+    if not fts_enabled():
+        return
+    rows = [
+        (fts_rowid(product.uid), product.uid.hex, product.product_name, product.product_description)
+        for product in products
+    ]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, uid, product_name, product_description) VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+
+def remove_products(uids):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(fts_rowid(uid),) for uid in uids])
+
+
+def rebuild_index(queryset, chunk_size=2000):
+    """Drop every index row and re-index `queryset`; returns the number indexed."""
+    if not fts_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    total = 0
+    chunk = []
+    for product in queryset.only('uid', 'product_name', 'product_description').iterator(chunk_size=chunk_size):
+        chunk.append(product)
+        if len(chunk) >= chunk_size:
+            index_products(chunk)
+            total += len(chunk)
+            chunk = []
+    index_products(chunk)
+    total += len(chunk)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def build_match_query(query):
+    """Turn free text into an FTS5 query: every word must match, last one as a prefix."""
+    tokens = _TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return ''
+    terms = ['"%s"' % token for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class SearchResults:
+    """bm25-ranked search results, paged with (score, rowid) keyset cursors."""
+
+    sort = 'relevance'
+
+    def __init__(self, query, queryset):
+        self.query = query
+        self.match = build_match_query(query)
+        self.queryset = queryset
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if not self.match:
+                self._count = 0
+            elif fts_enabled():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [self.match])
+                    self._count = cursor.fetchone()[0]
+            else:
+                self._count = self._fallback().count()
+        return self._count
+
+    def page(self, cursor=None, page_size=24):
+        if not self.match:
+            return KeysetPage([], self.sort)
+        if not fts_enabled():
+            return keyset_paginate(self._fallback(), self.sort, ('product_name', 'uid'), cursor, page_size)
+
+        direction = 'next'
+        boundary = None
+        if cursor:
+            sort, values, direction = decode_cursor(cursor)
+            if sort != self.sort or len(values) != 2:
+                raise InvalidCursor(cursor)
+            try:
+                boundary = (float(values[0]), int(values[1]))
+            except (TypeError, ValueError):
+                raise InvalidCursor(cursor)
+        forward = direction == 'next'
+        seek = '>' if forward else '<'
+        order = 'ASC' if forward else 'DESC'
+
+        sql = (
+            f'SELECT uid, rid, score FROM (SELECT uid, rowid AS rid, bm25({FTS_TABLE}, 0.0, %s, %s) AS score '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'
+        )
+        params = [NAME_WEIGHT, DESCRIPTION_WEIGHT, self.match]
+        if boundary:
+            sql += f' WHERE score {seek} %s OR (score = %s AND rid {seek} %s)'
+            params += [boundary[0], boundary[0], boundary[1]]
+        sql += f' ORDER BY score {order}, rid {order} LIMIT %s'
+        params.append(page_size + 1)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if not forward:
+            rows.reverse()
+
+        products = {product.uid.hex: product for product in self.queryset.filter(uid__in=[row[0] for row in rows])}
+        object_list = [products[row[0]] for row in rows if row[0] in products]
+
+        next_cursor = prev_cursor = None
+        if rows:
+            if (has_more if forward else boundary is not None):
+                next_cursor = encode_cursor(self.sort, [rows[-1][2], rows[-1][1]], 'next')
+            if (boundary is not None if forward else has_more):
+                prev_cursor = encode_cursor(self.sort, [rows[0][2], rows[0][1]], 'prev')
+        return KeysetPage(object_list, self.sort, next_cursor, prev_cursor)
+
+    def _fallback(self):
+        return self.queryset.filter(
+            Q(product_name__icontains=self.query) | Q(product_description__icontains=self.query)
+        )
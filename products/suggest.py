@@ -0,0 +1,84 @@
+"""
+In-memory prefix index for search-as-you-type suggestions.
+
+Every word position of every product and category name becomes a key in a
+sorted list, so "shi" finds both "Shirts" and "Formal Shirt" with one bisect.
+The index lives in the worker process and is rebuilt lazily when the catalog
+version changes; lookups never touch the database.
+"""
+
+from bisect import bisect_left
+import re
+
+from django.urls import reverse
+
+from .catalog import CatalogLocal
+from .models import Category, Product
+
+SUGGESTION_LIMIT = 8
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    return ' '.join(_WORD_RE.findall(text.lower()))
+
+
+class PrefixIndex:
+
+    def __init__(self, entries):
+        # entries: (label, kind, url) with kind 'category' or 'product'
+        self.entries = entries
+        keys = []
+        for position, (label, _kind, _url) in enumerate(entries):
+            words = normalize(label).split(' ')
+            for start in range(len(words)):
+                keys.append((' '.join(words[start:]), position))
+        keys.sort()
+        self.keys = [key for key, _position in keys]
+        self.positions = [position for _key, position in keys]
+
+    def lookup(self, prefix, limit=SUGGESTION_LIMIT):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        matches = []
+        seen = set()
+        i = bisect_left(self.keys, prefix)
+        while i < len(self.keys) and len(matches) < limit and self.keys[i].startswith(prefix):
+            position = self.positions[i]
+            if position not in seen:
+                seen.add(position)
+                matches.append(position)
+            i += 1
+        # Stable sort: categories ahead of products, otherwise alphabetical by matched words
+        matches.sort(key=lambda position: self.entries[position][1] != 'category')
+        return [self.entries[position] for position in matches]
+
+
+def build_index():
+    entries = [
+        (name, 'category', reverse('category_view', args=[slug]))
+        for name, slug in Category.objects.values_list('category_name', 'slug')
+        if slug
+    ]
+    entries += [
+        (name, 'product', reverse('get_product', args=[slug]))
+        for name, slug in Product.objects.values_list('product_name', 'slug').iterator(chunk_size=5000)
+        if slug
+    ]
+    return PrefixIndex(entries)
+
+
+_index = CatalogLocal(build_index)
+
+
+def get_index():
+    return _index.get()
+
+
+def suggest(prefix, limit=SUGGESTION_LIMIT):
+    return [
+        {'label': label, 'type': kind, 'url': url}
+        for label, kind, url in get_index().lookup(prefix, limit)
+    ]
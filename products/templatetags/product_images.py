@@ -0,0 +1,45 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from products import renditions
+from products.renditions import RENDITIONS, has_renditions, rendition_name
+
+register = template.Library()
+
+FALLBACK_IMAGE = '/media/images/items/1.jpg'
+
+
+def _srcset(field_file, ext, largest):
+    return format_html_join(
+        ', ', '{} {}w',
+        (
+            (field_file.storage.url(rendition_name(field_file.name, rendition, ext)), width)
+            for rendition, width in RENDITIONS.items()
+            if width <= largest
+        ),
+    )
+
+
+@register.filter
+def rendition_url(field_file, rendition):
+    """URL of a single JPEG rendition, falling back to the original upload."""
+    return renditions.rendition_url(field_file, rendition, FALLBACK_IMAGE)
+
+
+@register.simple_tag
+def responsive_image(field_file, rendition='card', css_class=''):
+    """<picture> with WebP and JPEG srcsets up to the requested rendition size."""
+    if not field_file or not has_renditions(field_file):
+        return format_html('<img src="{}" class="{}">', rendition_url(field_file, rendition), css_class)
+
+    width = RENDITIONS[rendition]
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}px">'
+        '<img src="{}" srcset="{}" sizes="{}px" class="{}" loading="lazy">'
+        '</picture>',
+        _srcset(field_file, 'webp', width), width,
+        field_file.storage.url(rendition_name(field_file.name, rendition, 'jpg')),
+        _srcset(field_file, 'jpg', width), width,
+        css_class,
+    )
@@ -1,3 +1,108 @@
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Category, ColorVariant, Product, ProductSKU, SizeVariant
+
+
+class ProductSKUMaintenanceTests(TestCase):
+    """SKU rows follow variant renames, links and deletes."""
+
+    def setUp(self):
+        category = Category.objects.create(category_name='Shirts')
+        self.shirt = Product.objects.create(product_name='Plain Shirt', category=category, price=500)
+        self.polo = Product.objects.create(product_name='Polo Shirt', category=category, price=700)
+        self.medium = SizeVariant.objects.create(size='M', price=50)
+        self.large = SizeVariant.objects.create(size='L', price=80)
+        self.red = ColorVariant.objects.create(color_name='Red', price=25)
+
+    def sizes(self, product):
+        """{size: (size variant id, price)} of the product's SKUs without a color."""
+        return {
+            sku.size: (sku.size_variant_id, sku.price)
+            for sku in ProductSKU.objects.filter(product=product, color='')
+        }
+
+    def test_rename_and_reprice_update_skus(self):
+        self.shirt.size_variant.add(self.medium)
+        self.shirt.color_variant.add(self.red)
+        self.medium.size = 'Medium'
+        self.medium.price = 60
+        self.medium.save()
+        self.assertEqual(self.sizes(self.shirt), {'': (None, 500), 'Medium': (self.medium.pk, 560)})
+        self.assertEqual(ProductSKU.objects.get(product=self.shirt, size='Medium', color='Red').price, 585)
+
+    def test_rename_onto_a_shared_name_keeps_one_sku_per_name(self):
+        self.shirt.size_variant.add(self.medium, self.large)
+        self.polo.size_variant.add(self.large)
+        self.large.size = 'M'
+        self.large.save()
+        self.assertEqual(set(self.sizes(self.shirt)), {'', 'M'})
+        self.assertEqual(self.sizes(self.polo), {'': (None, 700), 'M': (self.large.pk, 780)})
+
+        self.large.size = 'L'
+        self.large.save()
+        self.assertEqual(self.sizes(self.shirt), {
+            '': (None, 500), 'M': (self.medium.pk, 550), 'L': (self.large.pk, 580),
+        })
+
+    def test_reverse_add_remove_and_clear(self):
+        self.medium.product_set.add(self.shirt, self.polo)
+        self.assertIn('M', self.sizes(self.shirt))
+        self.assertIn('M', self.sizes(self.polo))
+
+        self.medium.product_set.remove(self.polo)
+        self.assertNotIn('M', self.sizes(self.polo))
+
+        self.medium.product_set.clear()
+        self.assertEqual(self.sizes(self.shirt), {'': (None, 500)})
+
+    def test_clear_falls_back_to_a_variant_of_the_same_name(self):
+        other_medium = SizeVariant.objects.create(size='M', price=40)
+        self.shirt.size_variant.add(self.medium, other_medium)
+        sku_variant = self.sizes(self.shirt)['M'][0]
+        SizeVariant.objects.get(pk=sku_variant).product_set.clear()
+        remaining = other_medium if sku_variant == self.medium.pk else self.medium
+        self.assertEqual(self.sizes(self.shirt)['M'], (remaining.pk, 500 + remaining.price))
+
+    def test_delete_falls_back_to_a_variant_of_the_same_name(self):
+        other_medium = SizeVariant.objects.create(size='M', price=40)
+        self.shirt.size_variant.add(self.medium, other_medium)
+        self.polo.size_variant.add(self.large)
+        sku_variant = self.sizes(self.shirt)['M'][0]
+        SizeVariant.objects.get(pk=sku_variant).delete()
+        remaining = other_medium if sku_variant == self.medium.pk else self.medium
+        self.assertEqual(self.sizes(self.shirt)['M'], (remaining.pk, 500 + remaining.price))
+
+        self.large.delete()
+        self.assertEqual(self.sizes(self.polo), {'': (None, 700)})
+
+
+class ConditionalProductPageTests(TestCase):
+    """304s never hide flash messages or a changed cart badge."""
+
+    def setUp(self):
+        category = Category.objects.create(category_name='Shirts')
+        self.product = Product.objects.create(product_name='Plain Shirt', category=category, price=500)
+        self.url = f'/product/{self.product.slug}/'
+
+    def test_pending_messages_get_a_full_response(self):
+        # The first render sets the CSRF cookie, which is part of the ETag
+        self.client.get(self.url)
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Not offered: the view redirects back to the product page with an error message
+        self.client.post('/cart/add/', {'product_slug': self.product.slug, 'size': 'XL'})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'not available')
+
+    def test_last_modified_only_for_visitors_without_state(self):
+        response = self.client.get(self.url)
+        last_modified = response['Last-Modified']
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.client.post('/cart/add/', {'product_slug': self.product.slug})
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
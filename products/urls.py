@@ -1,7 +1,10 @@
 from django.urls import path
-from products.views import get_product, category_view
+from products.views import get_product, category_view, variant_price
+from products.export_views import export_products
 
 urlpatterns = [
     path('category/<slug>/', category_view, name="category_view"),
+    path('export/products/', export_products, name="export_products"),
     path('<slug>/', get_product, name="get_product"),
+    path('<slug>/variant/', variant_price, name="variant_price"),
 ]
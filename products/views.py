@@ -1,25 +1,179 @@
-from django.shortcuts import render, get_object_or_404
-from .models import Product, Category
+from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404, JsonResponse
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
+from .catalog import get_catalog, get_catalog_version
+from .conditional import catalog_etag, catalog_last_modified, from_timestamp, make_etag, make_last_modified
+from .facets import facet_values, get_facet_index, parse_selection
+from .models import Product, ProductImage, ProductSKU
+from .pagination import InvalidCursor, keyset_paginate
+from .renditions import rendition_url
 
+CATEGORY_PAGE_SIZE = 24
+PRODUCT_CACHE_TIMEOUT = 60 * 60
 
+# Sort name -> keyset ordering; each ends in `uid` so keys are unique
+CATEGORY_SORTS = {
+    'newest': ('-create_at', '-uid'),
+    'price_asc': ('price', 'uid'),
+    'price_desc': ('-price', '-uid'),
+    'popular': ('-popularity', '-uid'),
+}
+
+
+def offered_variants(product, catalog):
+    """(sizes, colors) the product has SKUs for, in the catalog snapshot's order."""
+    # By variant id: only the first of several same-name variants has SKUs
+    offered = list(product.skus.values_list('size_variant_id', 'color_variant_id'))
+    sizes = {size for size, _color in offered}
+    colors = {color for _size, color in offered}
+    return (
+        [variant for variant in catalog.size_variants if variant.pk in sizes],
+        [variant for variant in catalog.color_variants if variant.pk in colors],
+    )
+
+
+def get_cached_product(slug):
+    """Product by slug from the cache, re-read once after any catalog change."""
+    key = f'product:{slug}:{get_catalog_version()}'
+    product = cache.get(key)
+    if product is None:
+        product = get_object_or_404(Product, slug=slug)
+        cache.set(key, product, PRODUCT_CACHE_TIMEOUT)
+    return product
+
+
+def get_cached_recommendations(product):
+    """The product's recommendations as a list, cached alongside the product itself.
+
+    Rebuilding recommendations bumps the catalog version, so the key moves on
+    with every new ranking as well as with any change to a recommended product.
+    """
+    key = f'product:{product.slug}:recommendations:{get_catalog_version()}'
+    recommendations = cache.get(key)
+    if recommendations is None:
+        # Precomputed by build_recommendations: one indexed read on (product, rank)
+        recommendations = list(
+            Product.objects.filter(recommended_for__product=product).order_by('recommended_for__rank').for_listing()
+        )
+        cache.set(key, recommendations, PRODUCT_CACHE_TIMEOUT)
+    return recommendations
+
+
+def product_etag(request, slug):
+    # The page also lists recommended products, which change with the catalog version
+    product = get_cached_product(slug)
+    stamp = f'{get_catalog_version()}-{product.updated_at.timestamp()}-{get_catalog().variants_version}'
+    return make_etag(request, stamp)
+
+
+def product_last_modified(request, slug):
+    product = get_cached_product(slug)
+    return make_last_modified(request, max(
+        product.updated_at,
+        from_timestamp(get_catalog().variants_version),
+        from_timestamp(get_catalog_version() / 1e9),
+    ))
+
+
+@condition(etag_func=product_etag, last_modified_func=product_last_modified)
 def get_product(request, slug):
-    """Display a single product. If `size` is provided in GET, compute price for that size."""
-    product = get_object_or_404(Product, slug=slug)
-    context = { 'product': product }
+    """Display a single product. If `size`/`color` are provided in GET, show the price of that SKU.
+
+    The gallery and variant selectors are cached template fragments keyed on
+    `fragment_version`; the querysets below are lazy and only run on a miss.
+    Recommendations come from the low-level cache, so a warm page runs no queries.
+    """
+    product = get_cached_product(slug)
+    catalog = get_catalog()
+    context = {
+        'product': product,
+        'fragment_version': f'{product.updated_at.timestamp()}-{catalog.variants_version}',
+    }
 
-    size = request.GET.get('size')
-    if size:
+    variants = SimpleLazyObject(lambda: offered_variants(product, catalog))
+    context['sizes'] = SimpleLazyObject(lambda: variants[0])
+    context['colors'] = SimpleLazyObject(lambda: variants[1])
+
+    size = request.GET.get('size', '')
+    color = request.GET.get('color', '')
+    if size or color:
         try:
-            context['price'] = product.get_product_price_by_size(size)
-        except Exception as e:
-            # If size not found or other error, just log and continue
+            context['updated_price'] = product.get_sku(size, color).price
+            context['selected_size'] = size
+            context['selected_color'] = color
+        except ProductSKU.DoesNotExist as e:
+            # If the combination is not offered, just log and continue
             print(e)
+    context['recommendations'] = get_cached_recommendations(product)
+    if context.get('selected_color'):
+        context['product_images'] = product.product_images.filter(color_variant__color_name=color).order_by('create_at')
 
     return render(request, 'product/product.html', context=context)
 
 
+def variant_price(request, slug):
+    """Price and gallery of one size/color combination as JSON, for in-place variant switching."""
+    size = request.GET.get('size', '')
+    color = request.GET.get('color', '')
+    try:
+        sku = ProductSKU.objects.only('price', 'product_id').get(product__slug=slug, size=size, color=color)
+    except ProductSKU.DoesNotExist:
+        return JsonResponse({'success': False, 'message': 'Selected size/color combination is not available'}, status=404)
+
+    images = list(
+        ProductImage.objects.filter(product_id=sku.product_id).select_related('color_variant').order_by('create_at')
+    )
+    # Same fallback as the page: the color's own images if it has any, else the whole gallery
+    color_images = [image for image in images if image.color_variant and image.color_variant.color_name == color]
+    return JsonResponse({
+        'success': True,
+        'price': sku.price,
+        'images': [
+            {'detail': rendition_url(image.image, 'detail'), 'thumb': rendition_url(image.image, 'thumb')}
+            for image in (color_images or images)
+        ],
+    })
+
+
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
 def category_view(request, slug):
-    """List products under a category identified by slug."""
-    category = get_object_or_404(Category, slug=slug)
-    products = category.products.all()
-    return render(request, 'products/category.html', { 'category': category, 'products': products })
\ No newline at end of file
+    """List products under a category identified by slug, one keyset page at a time."""
+    category = get_catalog().categories_by_slug.get(slug)
+    if category is None:
+        raise Http404('No Category matches the given query.')
+    sort = request.GET.get('sort')
+    if sort not in CATEGORY_SORTS:
+        sort = 'newest'
+
+    selected = parse_selection(request.GET)
+    filters = urlencode([(facet, value) for facet, values in selected.items() for value in values])
+    index = get_facet_index(category.pk, CATEGORY_SORTS)
+    mask = index.mask(selected)
+
+    try:
+        if filters:
+            # Filtered pages come from the facet index; only the page itself is read
+            page = index.page(mask, sort, cursor=request.GET.get('cursor'), page_size=CATEGORY_PAGE_SIZE)
+            products = {product.uid: product for product in Product.objects.for_listing().filter(uid__in=page.object_list)}
+            page.object_list = [products[uid] for uid in page.object_list if uid in products]
+        else:
+            page = keyset_paginate(
+                category.products.for_listing(), sort, CATEGORY_SORTS[sort],
+                cursor=request.GET.get('cursor'), page_size=CATEGORY_PAGE_SIZE,
+            )
+    except InvalidCursor:
+        return redirect(f'{request.path}?sort={sort}' + (f'&{filters}' if filters else ''))
+
+    context = {
+        'category': category,
+        'products': page.object_list,
+        'page': page,
+        'sort': sort,
+        'filters': filters,
+        'facets': facet_values(index, selected),
+        'product_count': mask.bit_count(),
+    }
+    return render(request, 'products/category.html', context)